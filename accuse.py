@@ -0,0 +1,99 @@
+""" Whether to accuse now, and whom: the most probable solution within a
+    time budget.
+
+    The answer is refined in stages, each cheaper than the next, and the
+    best so far is returned when the budget runs out:
+        solver - the cards the envelope can still hold.  If there is one
+            in each category the solution is certain.  Otherwise the cards
+            most players are known not to hold are taken, with the chance
+            of a blind guess among the cards left as a first estimate.
+        sampled - deals consistent with every hand are sampled.  The
+            envelope seen most often is the answer, and its probability
+            is its share of the samples, with its Wilson interval.  Sampling
+            stops as soon as the low end of the interval reaches the
+            confidence asked for.  The samples come from a Markov chain
+            (see sampler), so with only a few of them the interval is
+            too narrow.
+    The solver and the burn-in of the sampler share the deadline, and
+    the solver stops early with sound but less complete results, so the
+    answer comes in about the budget however large the deck.  Exact
+    counting (see probability) can't be interrupted, so it is not used.
+"""
+import time
+from random import Random
+from engine import deck_of, likely_solution_nums
+from logic_tree import nums
+from sampler import Chain, wilson
+from solver import Solver
+
+class Accusation:
+    """ The most probable solution found: cards, one per category, with
+        its probability and the (low, high) interval around it, the
+        stage that gave it, and the number of deals sampled.
+    """
+
+    def __init__(self, cards, probability, low, high, stage, samples=0):
+        self.cards = cards
+        self.probability = probability
+        self.low = low
+        self.high = high
+        self.stage = stage
+        self.samples = samples
+
+    @property
+    def certain(self):
+        return self.low >= 1.0
+
+    def confident(self, confidence):
+        """ whether the solution is at least that likely """
+        return self.low >= confidence
+
+    def __repr__(self):
+        return 'Accusation({}, {:.3f} ({:.3f} - {:.3f}), {}, {})'.format(
+            self.cards, self.probability, self.low, self.high, self.stage,
+            self.samples)
+
+def accuse(players, budget=1.0, confidence=0.95, seed=None, check_every=20):
+    """ The most probable solution, found within budget seconds, or
+        sooner if it is at least confidence likely.  Returns None if no
+        deal is consistent with the players' hands.
+    """
+    deadline = time.perf_counter() + budget
+    deck = deck_of(players)
+    solver = Solver(players, deck.categories, deadline=deadline)
+    if not solver.consistent():
+        return None
+    can = solver.can[solver.envelope]
+    left = [[n for n in cat if can >> n & 1] for cat in deck.categories]
+    if all(len(cards) == 1 for cards in left):
+        return Accusation([cards[0] for cards in left], 1.0, 1.0, 1.0,
+                          'solver')
+    likely = dict(likely_solution_nums(players))
+    guess = [max(cards, key=lambda n: (likely.get(n, 0), -n))
+             for cards in left]
+    chance = 1.0
+    for cards in left:
+        chance /= len(cards)
+    best = Accusation(guess, chance, 0.0, 1.0, 'solver')
+
+    chain = Chain(solver, Random(seed))
+    seen = {}
+    samples = 0
+    while time.perf_counter() < deadline:
+        deal = chain.sample()
+        if deal is None:
+            break
+        envelope = deal[solver.envelope]
+        seen[envelope] = seen.get(envelope, 0) + 1
+        samples += 1
+        if samples % check_every == 0 and \
+                sampled(seen, samples).confident(confidence):
+            break
+    return sampled(seen, samples) if samples else best
+
+def sampled(seen, samples):
+    """ the envelope seen most often, from the count of each one seen """
+    envelope = max(seen, key=lambda e: (seen[e], -e))
+    p = seen[envelope] / samples
+    low, high = wilson(p, samples)
+    return Accusation(nums(envelope), p, low, high, 'sampled', samples)
@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+""" Measure how the time per suggestion grows with the size of the deck.
+
+    For each deck, seeded random games are played with the solver and the
+    time taken to record each suggestion, deductions included, is noted.
+    Decks are given as 'classic', 'master' (Master Detective) or the
+    sizes of the categories, e.g. 20,20,20 or 50x4 for four categories
+    of fifty cards.  The players' trees can be any of the tree classes.
+
+    The solver is given DEDUCE_SECONDS per card after each suggestion
+    (see engine.deduce), so its share of the time stays bounded as the
+    deck grows.  Beyond about 60 cards most of the rest goes to absorbing
+    branches in the larger hands' bittrees; with -t budgettree the
+    trees are bounded as well, and a suggestion on a 120 card deck takes
+    well under a second.
+
+    With --suite, a fixed set of workloads is run instead (see SUITE):
+    positive responses alone, which only ever grow a tree, random games
+    dealt as automate deals them, and games with large custom decks.
+    Each reports operations per second, the peak number of branches and
+    the peak memory allocated (unless --no-memory is given, as tracing it
+    is slow), and the results can be saved as JSON with -o and compared
+    with an earlier run with -c.
+"""
+import argparse
+import json
+import platform
+import subprocess
+import time
+import tracemalloc
+from random import Random
+from deck import CLASSIC, MASTER_DETECTIVE, custom_deck
+from engine import Player, play, random_game
+from logic_tree import tree, bittree, cnftree, budgettree
+
+DECKS = {'classic': CLASSIC, 'master': MASTER_DETECTIVE}
+
+def parse_deck(spec):
+    """ the deck named by a command line spec """
+    if spec in DECKS:
+        return DECKS[spec]
+    if 'x' in spec:
+        size, n = spec.split('x')
+        return custom_deck([int(size)] * int(n))
+    return custom_deck([int(size) for size in spec.split(',')])
+
+def deal_sizes(deck, nplayers):
+    """ the cards dealt to each player, spread as evenly as possible """
+    n = len(deck) - len(deck.categories)
+    return [n // nplayers + (i < n % nplayers) for i in range(nplayers)]
+
+def tree_class(name):
+    """ the tree class with the given name """
+    if name == 'nptree':
+        from nptree import nptree
+        return nptree
+    return {'tree': tree, 'bittree': bittree, 'cnftree': cnftree,
+            'budgettree': budgettree}[name]
+
+def bench_deck(deck, games=3, nplayers=6, suggestions=40, seed=0,
+               hand_tree=bittree):
+    """ Play the games and return the time of each suggestion, in
+        seconds, and the most branches any player's tree reached.
+    """
+    times = []
+    peak = 0
+    for g in range(games):
+        rng = Random(seed + g)
+        players = [Player('P{}'.format(i+1), n, False, deck=deck,
+                          tree=hand_tree)
+                   for i, n in enumerate(deal_sizes(deck, nplayers))]
+        hands, solution, made = random_game(players, rng)
+        last = [time.perf_counter()]
+
+        def lap(i, suggester, query, responses):
+            nonlocal peak
+            now = time.perf_counter()
+            times.append(now - last[0])
+            peak = max([peak] + [len(p.hand.branches) for p in players])
+            last[0] = time.perf_counter()
+
+        play(players, (hands, solution, made[:suggestions]), lap)
+    return times, peak
+
+def grow_disjoint(hand_tree, queries=7):
+    """ Positive queries with no card in common: nothing is pruned or
+        absorbed, so the tree ends with 3**queries branches.
+    """
+    t = hand_tree()
+    for i in range(queries):
+        t.add_pos([3*i, 3*i + 1, 3*i + 2])
+    return queries, len(t.branches)
+
+def grow_random(hand_tree, queries=40, ncards=21, seed=0):
+    """ Positive queries of three random cards and no negatives """
+    rng = Random(seed)
+    t = hand_tree()
+    peak = 0
+    for i in range(queries):
+        t.add_pos(rng.sample(range(ncards), 3))
+        peak = max(peak, len(t.branches))
+    return queries, peak
+
+def games(hand_tree, deck=CLASSIC, ngames=5, nplayers=6, suggestions=40,
+          seed=0):
+    """ Seeded random games; an operation is a suggestion """
+    times, peak = bench_deck(deck, ngames, nplayers, suggestions, seed,
+                             hand_tree)
+    return len(times), peak
+
+# name -> workload, called with the tree class, returning the number of
+# operations done and the peak number of branches
+SUITE = {
+    'grow-disjoint': grow_disjoint,
+    'grow-random': grow_random,
+    'games-classic': games,
+    'games-master': lambda t: games(t, MASTER_DETECTIVE, ngames=3),
+    'games-20x4': lambda t: games(t, custom_deck([20] * 4), ngames=1,
+                                  suggestions=20),
+}
+
+def measure(workload, hand_tree, memory=True):
+    """ Run a workload, and then run it again tracing its memory unless
+        memory is False, since tracing slows it down many times over.
+    """
+    start = time.perf_counter()
+    ops, peak = workload(hand_tree)
+    seconds = time.perf_counter() - start
+    result = {'ops': ops, 'seconds': seconds, 'ops_per_sec': ops / seconds,
+              'peak_branches': peak, 'peak_kib': None}
+    if memory:
+        tracemalloc.start()
+        try:
+            workload(hand_tree)
+            result['peak_kib'] = tracemalloc.get_traced_memory()[1] / 1024
+        finally:
+            tracemalloc.stop()
+    return result
+
+def commit():
+    """ the current git commit, if there is one """
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'],
+                              capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run_suite(hand_tree, names=None, memory=True, out=print):
+    """ Run the workloads in the suite, or those named, and return the
+        results as a JSON-ready dict.
+    """
+    results = {}
+    out('{:<14} {:>6} {:>10} {:>9} {:>9}'.format(
+        'workload', 'ops', 'ops/sec', 'branches', 'peak KiB'))
+    for name in names or SUITE:
+        r = results[name] = measure(SUITE[name], hand_tree, memory)
+        out('{:<14} {:>6} {:>10.1f} {:>9} {:>9}'.format(
+            name, r['ops'], r['ops_per_sec'], r['peak_branches'],
+            '-' if r['peak_kib'] is None else round(r['peak_kib'])))
+    return {'commit': commit(), 'python': platform.python_version(),
+            'tree': hand_tree.__name__, 'results': results}
+
+def compare(before, after, out=print):
+    """ Print the change in speed and size between two suite results """
+    out('{:<14} {:>10} {:>9} {:>9}'.format(
+        'workload', 'speed', 'branches', 'memory'))
+    for name, r in after['results'].items():
+        old = before['results'].get(name)
+        if old:
+            memory = '-' if r['peak_kib'] is None or not old['peak_kib'] \
+                     else '{:.2f}x'.format(r['peak_kib'] / old['peak_kib'])
+            out('{:<14} {:>9.2f}x {:>8.2f}x {:>9}'.format(
+                name, r['ops_per_sec'] / old['ops_per_sec'],
+                r['peak_branches'] / max(old['peak_branches'], 1), memory))
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(p * len(values)))]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('decks', nargs='*',
+                        default=['classic', 'master', '20x3', '30x4', '50x4'],
+                        help='decks to time')
+    parser.add_argument('-g', '--games', type=int, default=3,
+                        help='games per deck')
+    parser.add_argument('-p', '--players', type=int, default=6,
+                        help='players per game')
+    parser.add_argument('-n', '--suggestions', type=int, default=40,
+                        help='most suggestions per game')
+    parser.add_argument('-s', '--seed', type=int, default=0,
+                        help='seed of the first game')
+    parser.add_argument('-t', '--tree', default='bittree',
+                        choices=['tree', 'bittree', 'cnftree', 'budgettree',
+                                 'nptree'],
+                        help='tree class for the hands')
+    parser.add_argument('--suite', nargs='*', choices=sorted(SUITE),
+                        help='run the benchmark suite, or some of it, '
+                             'instead of timing decks')
+    parser.add_argument('--no-memory', action='store_true',
+                        help="don't trace the suite's memory, which is slow")
+    parser.add_argument('-o', '--output', help='save the suite results as '
+                                               'JSON')
+    parser.add_argument('-c', '--compare', help='suite results to compare '
+                                                'with')
+    args = parser.parse_args(argv)
+    if args.suite is not None:
+        results = run_suite(tree_class(args.tree), args.suite,
+                            not args.no_memory)
+        if args.output:
+            with open(args.output, 'w') as f:
+                json.dump(results, f, indent=2)
+        if args.compare:
+            with open(args.compare) as f:
+                compare(json.load(f), results)
+        return
+    print('{:>6} {:>5} {:>6} {:>9} {:>9} {:>9} {:>9}'.format(
+        'cards', 'cats', 'moves', 'median ms', 'p95 ms', 'max ms', 'branches'))
+    for spec in args.decks:
+        deck = parse_deck(spec)
+        times, peak = bench_deck(deck, args.games, args.players,
+                                 args.suggestions, args.seed,
+                                 tree_class(args.tree))
+        print('{:>6} {:>5} {:>6} {:>9.1f} {:>9.1f} {:>9.1f} {:>9}'.format(
+            len(deck), len(deck.categories), len(times),
+            1000 * percentile(times, 0.5), 1000 * percentile(times, 0.95),
+            1000 * max(times), peak), flush=True)
+
+if __name__ == '__main__':
+    main()
@@ -1,53 +1,17 @@
 #!/usr/bin/env python3
-from logic_tree import *
+from engine import *
+from sampler import estimate
 from menu import Menu
-import pickle
-from itertools import product
-from collections import Counter
-from random import choice, shuffle
-
-class Player:
-    """ A class representing a player in the game Clue """
-
-    def __init__(self, name, ncards, is_cpu, knowns=None):
-        self.name = name
-        self.ncards = ncards
-        self.is_cpu = is_cpu
-        self.hand = tree()
-        self.true_hand = None
-        if self.is_cpu:
-            self.hand.add_neg(list(allcardset() - set(knowns)))
-            for k in knowns:
-                self.hand.add_pos([k])
-
-    def print_hand(self):
-        """ print the cards the player is known to have and not to have """
-        pos = [ALLCARDS[num] for num in self.hand.pos_elements()]
-        neg = [ALLCARDS[num] for num in self.hand.neg_elements()]
-        posstr = 'In hand: {}'.format(', '.join(pos))
-        negstr = 'Not in hand: {}'.format(', '.join(neg))
-        print(self.name)
-        if pos:
-            print(posstr)
-        if neg:
-            print(negstr)
-
-    # All queries and cards are indices into the ALLCARDS list
-    def update_for_no(self, query):
-        self.hand.add_neg(query)
-
-    def update_for_yes(self, query):
-        self.hand.add_pos(query)
-
-    def update_for_card(self, card):
-        self.hand.add_pos([card])
-
-    def possibles(self):
-        """ Nested list representing disjunctions """
-        poss = self.hand.possibles()
-        return [[ALLCARDS[n] for n in sub] for sub in poss]
-
+from eventlog import EventLog
+from observer import Observers
+import instrument
+try:
+    from recommend import recommend
+except ImportError:     # numpy is not installed
+    recommend = None
 
+# the saved game is kept in SAVE_PATH.log and SAVE_PATH.snap
+SAVE_PATH = 'clue'
 
 # -----------
 # UI Helpers
@@ -109,38 +73,9 @@ def get_list(prompt, n, allowed=None):
                 
 
 
-def sync_players(players):
-    """ manually synchronize using the fact that if a player has a card,
-        the others don't """
-    for p, p1 in product(players, repeat=2):
-            if p != p1:
-                for n in (p.hand.pos_elements() - p1.hand.neg_elements()):
-                    p1.hand.add_neg([n])
-
-
 def base_to_zero(nums):
     return [n-1 for n in nums]
 
-def indices_to_all(nums):
-    """ change the indices of a zero-based query to index into ALLCARDS """
-    s, w, r = nums
-    return [s, w+NS, r+NS+NW]
-
-def text_query(nums):
-    """ get the names for a zero-based query """
-    return [ALLCARDS[i] for i in nums]
-
-def allcardset():
-    """ a set containing all the cards """
-    return set(range(len(ALLCARDS)))
-
-
-def get_responders(players, suggester):
-    """ get the responders (in the correct order) for the given suggester """
-    si = players.index(suggester)
-    return players[si+1:] + players[:si]
-
-
 def pause(msg=None):
     if msg:
         print(msg)
@@ -254,10 +189,11 @@ def confirm_response_other_suggested(resp, pname):
     return confirm
 
 
-def add_suggestion(players):
+def add_suggestion(game):
     """ Enter a suggestion made by a player
         along with the responses of the other players
     """
+    players = game.players
     suggester = get_suggester(players)
     if not suggester:
         return
@@ -269,12 +205,17 @@ def add_suggestion(players):
     if not confirm_suggestion(textquery):
         return
 
+    responses = []
+    shown = None
     responders = get_responders(players, suggester)
     for player in responders:
         if player.is_cpu:
-            if player.hand.contains_any(numquery):
-                pause("CPU showed a card")
+            if player.has_any(numquery):
+                shown = game.advise(suggester, numquery)
+                pause("CPU shows {}".format(ALLCARDS[shown]))
+                responses.append((player, True))
                 break
+            responses.append((player, None))
         else:
             print()
             print("Response from {}".format(player.name))
@@ -283,19 +224,20 @@ def add_suggestion(players):
                 if not confirm_response_cpu_suggested(card, player.name):
                     return
                 if card == False:
-                    player.update_for_no(numquery)
+                    responses.append((player, None))
                 elif card > 0:
-                    player.update_for_card(card-1)
+                    responses.append((player, card-1))
                     break
                 else:
                     return
             else:
                 resp = get_response_other_suggested(textquery)
                 if resp:
-                    player.update_for_yes(numquery)
+                    responses.append((player, True))
                     break
                 else:
-                    player.update_for_no(numquery)
+                    responses.append((player, None))
+    game.suggest(suggester, numquery, responses, shown)
 
 
 def automate(players, test_data=None, display=False):
@@ -315,62 +257,47 @@ def automate(players, test_data=None, display=False):
         OUTPUTS
         computed_solution, true_solution, suggestions_made
     """
-    def get_query_triple():
-        return (choice(range(NS)), choice(range(NW)), choice(range(NR)))
-
-    def deal():
-        true_solution = get_query_triple()
-        ac = set(range(NS+NW+NR))
-        ac -= set(indices_to_all(true_solution))
-        ac = list(ac)
-        shuffle(ac)
-        for p in players:
-            p.true_hand = ac[:p.ncards]
-            ac = ac[p.ncards:]
-            assert len(p.true_hand) == p.ncards
-        return true_solution
-        
-    if test_data:
-        true_hands, true_solution, suggestions = test_data
-        for player, true_hand in zip(players, true_hands):
-            player.true_hand = true_hand
-    else:
-        true_solution = deal()
-        suggestions = [(i % len(players), get_query_triple()) for i in range(100)]
-        if display: 
-            print("True solution")
-            print(str([SUSPECTS[true_solution[0]],
-                       WEAPONS[true_solution[1]],
-                       ROOMS[true_solution[2]]]))
+    observers = Observers(deck_of(players))
+    for p in players:
+        observers.add_player(p.name, p.ncards, p.is_cpu, p.pos)
+    shown = [None]
+
+    def choose(suggester, cards):
+        shown[0] = observers.advise(suggester, cards)[0]
+        return shown[0]
 
-    for i, item in enumerate(suggestions):
-        pid, query = item
-        qset = set(indices_to_all(query))
-        suggester = players[pid]
+    def show(i, suggester, query, responses):
+        observers.record(suggester, query, responses, shown[0])
         if display: 
             print()
-            print("{}. {} suggested {}.".format(i+1, suggester.name, text_query(qset)))
-        responders = get_responders(players, suggester)
-        for r in responders:
-            isect = qset & set(r.true_hand)
-            if len(isect) == 0:
-                r.update_for_no(qset)
-                if display: 
+            print("{}. {} suggested {}.".format(i+1, suggester.name, text_query(query)))
+            for r, response in responses:
+                if response is None:
                     print("{} had none.".format(r.name))
-            else:
-                if suggester.is_cpu:
-                    card = isect.pop()
-                    r.update_for_card(card)
-                    if display: 
-                        print("{} showed {}.".format(r.name, ALLCARDS[card]))
+                elif response is True and r.is_cpu:
+                    print("{} showed {}.".format(r.name, ALLCARDS[shown[0]]))
+                elif response is True:
+                    print("{} showed a card.".format(r.name))
                 else:
-                    r.update_for_yes(qset)
-                    if display: 
-                        print("{} showed a card.".format(r.name))
-                break
-        pause()
-        if found_solution(players): break
-    return true_solution, definite_solution_nums(players), suggestions[:i+1]
+                    print("{} showed {}.".format(r.name, ALLCARDS[response]))
+            for p in players:
+                if not p.is_cpu and observers.progress(p)['solved']:
+                    print("{} can solve the game.".format(p.name))
+            pause()
+        shown[0] = None
+
+    if not test_data:
+        test_data = random_game(players)
+        if display: 
+            true_solution = test_data[1]
+            print("True solution")
+            print(str([SUSPECTS[true_solution[0]],
+                       WEAPONS[true_solution[1]],
+                       ROOMS[true_solution[2]]]))
+    result = play(players, test_data, show, choose=choose)
+    if instrument.enabled:
+        instrument.dump()
+    return result
 
 
 def get_player(players):
@@ -408,9 +335,9 @@ def confirm_cpu_player_cards(cards):
     return confirm
 
 
-def add_player(players):
+def add_player(game):
     """ add a player to the game """
-    name, ncards, is_cpu = get_player(players)
+    name, ncards, is_cpu = get_player(game.players)
     if not confirm_player(name, ncards, is_cpu):
         return
     knowns = None
@@ -420,25 +347,20 @@ def add_player(players):
             return
         if not confirm_cpu_player_cards(cards):
             return
-        players.append(Player(name, ncards, is_cpu, base_to_zero(cards)))
-    else:
-        players.append(Player(name, ncards, is_cpu))
-    set_player_options(players)
-    set_main_options(players)
-    set_player_del_options(players)
+        knowns = base_to_zero(cards)
+    game.add_player(name, ncards, is_cpu, knowns)
+    refresh_options(game)
 
 
-def delete_player(players):
+def delete_player(game):
     """ delete a player """
     confirm = get_bool("Are you sure you want to delete player {}"
                        .format(current_player.name), default=True)
     if not confirm:
         abort_delete_player("User cancelled")
         return
-    players.remove(current_player)
-    set_player_options(players)
-    set_main_options(players)
-    set_player_del_options(players)
+    game.remove_player(current_player)
+    refresh_options(game)
     m_player_del.close()
 
 # ----------------------------------------
@@ -456,6 +378,67 @@ def print_likely_solution(players):
     pause()
 
 
+def print_solution_probabilities(players, seconds=2):
+    """ print the exact envelope probabilities, or sampled ones if they
+        take longer than seconds to count """
+    probs = solution_probabilities(players, seconds)
+    if probs is None:
+        print('Too many deals to count in {} seconds, so they are sampled'
+              .format(seconds))
+        print_sampled_solution(players)
+        return
+    for card, prob in probs:
+        print('{:.3f} {}'.format(prob, card))
+    pause()
+
+
+def print_opponent_progress(game):
+    """ print what each opponent can have worked out so far """
+    for p in game.players:
+        if p.is_cpu:
+            continue
+        progress = game.progress(p)
+        print('{}: {}{} solution card(s), {} of our cards, {:.0%} placed'
+              .format(p.name, 'solved, ' if progress['solved'] else '',
+                      len(progress['solution']), len(progress['cpu_cards']),
+                      progress['placed']))
+    pause()
+
+
+def print_accusation(game, seconds=2, confidence=0.95):
+    """ print the solution to accuse with, if any, and how likely it is """
+    accusation = game.accuse(seconds, confidence)
+    if accusation is None:
+        pause('The hands are inconsistent')
+        return
+    print('{} ({:.3f}, {:.3f} - {:.3f})'.format(
+        game.deck.text_query(accusation.cards), accusation.probability,
+        accusation.low, accusation.high))
+    print('Accuse now' if accusation.confident(confidence)
+          else 'Not sure enough to accuse')
+    pause()
+
+
+def print_sampled_solution(players, seconds=5):
+    """ print sampled envelope probabilities with their intervals """
+    result = estimate(players, categories(), seconds=seconds)
+    probs = [(p, low, high, ALLCARDS[n]) for n, (p, low, high)
+             in enumerate(result.solution_probabilities()) if p]
+    for p, low, high, card in sorted(probs, reverse=True):
+        print('{:.3f} ({:.3f} - {:.3f}) {}'.format(p, low, high, card))
+    print('{} samples{}'.format(result.samples,
+                                '' if result.complete else ' (partial)'))
+    pause()
+
+
+def print_recommendations(players):
+    """ print the suggestions expected to tell the CPU the most """
+    cpu = next(i for i, p in enumerate(players) if p.is_cpu)
+    for bits, query in recommend(players, categories(), cpu):
+        print('{:.2f} bits  {}'.format(bits, text_query(query)))
+    pause()
+
+
 def print_player_possibles(players):
     for p in players:
         print(p.name)
@@ -464,98 +447,123 @@ def print_player_possibles(players):
     pause()
 
 
-def definite_solution(players):
-    """ The solution to the game """
-    defs = definite_solution_nums(players)
-    return [ALLCARDS[c] for c in defs]
+def print_hand(player):
+    """ print the cards the player is known to have and not to have """
+    pos = [player.deck.cards[num] for num in sorted(player.pos)]
+    neg = [player.deck.cards[num] for num in sorted(player.neg)]
+    print(player.name)
+    if getattr(player.hand, 'degraded', False):
+        print('(Too many possibilities to follow them all for now)')
+    if pos:
+        print('In hand: {}'.format(', '.join(pos)))
+    if neg:
+        print('Not in hand: {}'.format(', '.join(neg)))
+
+def player_hands(players):
+    for player in players:
+        print_hand(player)
+        print()
+    pause()
+
+def undo(game):
+    if game.undo():
+        refresh_options(game)
+        pause('Undone')
+    else:
+        pause('Nothing to undo')
 
 
-def found_solution(players):
-    """ Indicate the game was solved """
-    return len(definite_solution(players)) == 3
+def redo(game):
+    if game.redo():
+        refresh_options(game)
+        pause('Redone')
+    else:
+        pause('Nothing to redo')
 
 
-def likely_solution(players):
-    """ Return tuples of cards with the
-        number of players who don't have them
-    """
-    likely = likely_solution_nums(players)
-    return sorted([(ALLCARDS[n], ct) for n, ct in likely],
-                  key=lambda tp: tp[1], reverse=True)
+def rewind(game):
+    """ go back to the game as it was after a given suggestion """
+    for i, event in enumerate(game.suggestions()):
+        print("{}. {} suggested {}.".format(
+            i+1, event['suggester'], text_query(event['query'])))
+    turn = get_int("Rewind to after suggestion number (0 for none)",
+                   allowed=range(0, len(game.suggestions())+1))
+    game.rewind(turn)
+    refresh_options(game)
+    pause('Rewound')
 
 
-def definite_solution_nums(players):
-    likely = likely_solution_nums(players)
-    if len(likely) == 3:
-        return [k for k, v in likely]
-    else:
-        none = [p.hand.neg_elements() for p in players]
-        return set.intersection(*none)
+def refresh_options(game):
+    set_player_options(game)
+    set_main_options(game)
+    set_player_del_options(game)
 
-def likely_solution_nums(players):
-    not_in_hand = Counter(n for p in players for n in p.hand.neg_elements())
-    knowns = set(n for p in players for n in p.hand.pos_elements())
-    return [(k,v) for k, v in not_in_hand.items() if k not in knowns]
 
-def player_hands(players):
-    for player in players:
-        player.print_hand()
-        print()
-    pause()
+def save_game(game):
+    """ Snapshot the game and log every change to it from now on """
+    EventLog(SAVE_PATH).start(game)
+    pause('Saved to file')
 
-def save_players(players):
-    with open('clue.pkl', 'wb') as f:
-        pickle.dump(players, f)
-        pause('Saved to file')
-
-def load_players():
-    with open('clue.pkl', 'rb') as f:
-        players = pickle.load(f)
-        set_player_options(players)
-        set_main_options(players)
-        set_player_del_options(players)
-        m_player_del.close()
-        pause('Loaded from file')
+def load_game():
+    """ Load the saved game, which goes on being logged """
+    global game
+    game = EventLog(SAVE_PATH).load(observe=True)
+    refresh_options(game)
+    m_player_del.close()
+    pause('Loaded from file')
 # ----------
 # Menu Setup
 # ----------
 
 
-def set_main_options(players):
+def set_main_options(game):
+    players = game.players
     m_main.title = "Clue"
     m_main.options = []
     m_main.add_option("Quit", m_main.close)
-    m_main.add_option("Save", lambda: save_players(players))
-    m_main.add_option("Load", lambda: load_players())
+    m_main.add_option("Save", lambda: save_game(game))
+    m_main.add_option("Load", lambda: load_game())
+    m_main.add_option("Undo", lambda: undo(game))
+    m_main.add_option("Redo", lambda: redo(game))
     if players:
-        m_main.add_option("Add Suggestion", lambda: add_suggestion(players))
-        m_main.add_option("Sync Players", lambda: sync_players(players))
+        m_main.add_option("Add Suggestion", lambda: add_suggestion(game))
+        m_main.add_option("Rewind", lambda: rewind(game))
         m_main.add_option("Player hands", lambda: player_hands(players))
         m_main.add_option("Player possibles",
                           lambda: print_player_possibles(players))
         m_main.add_option("Likely solution cards",
                           lambda: print_likely_solution(players))
+        m_main.add_option("Solution probabilities",
+                          lambda: print_solution_probabilities(players))
+        m_main.add_option("Sampled solution probabilities",
+                          lambda: print_sampled_solution(players))
+        if recommend and any(p.is_cpu for p in players):
+            m_main.add_option("Recommend suggestions",
+                              lambda: print_recommendations(players))
         m_main.add_option("Definite solution cards",
                           lambda: print_definite_solution(players))
+        m_main.add_option("Accuse now?", lambda: print_accusation(game))
+        m_main.add_option("Opponent progress",
+                          lambda: print_opponent_progress(game))
         m_main.add_option("Automate",
                           lambda: automate(players, display=True))
     m_main.add_option("Manage Players", m_player.open)
 
 
-def set_player_options(players):
+def set_player_options(game):
     m_player.options = []
     m_player.add_option("Return to Main Menu", m_player.close)
-    m_player.add_option("Add Player", lambda: add_player(players))
-    for player in players:
+    m_player.add_option("Add Player", lambda: add_player(game))
+    for player in game.players:
         m_player.add_option(
             player.name, lambda p=player: set_player_open_del(p))
 
 
-def set_player_del_options(players):
+def set_player_del_options(game):
     m_player_del.options = []
     m_player_del.add_option("Return to Player List",
                             m_player_del.close)
-    m_player_del.add_option("Delete", lambda: delete_player(players))
+    m_player_del.add_option("Delete", lambda: delete_player(game))
 
 
 def set_player_open_del(player):
@@ -567,23 +575,13 @@ def set_player_open_del(player):
 # -------------
 # Main Program
 # -------------
-SUSPECTS = ['Colonel Mustard', 'Mr. Green', 'Professor Plum',
-            'Miss Scarlet', 'Ms White', 'Mrs. Peacock']
-WEAPONS = ['lead pipe', 'candlestick', 'rope', 'knife',
-           'wrench', 'pistol']
-ROOMS = ['hall', 'conservatory', 'library', 'dining room',
-         'kitchen', 'billiard room', 'study', 'lounge', 'ball room']
-ALLCARDS = SUSPECTS + WEAPONS + ROOMS
-
-NS, NW, NR = len(SUSPECTS), len(WEAPONS), len(ROOMS)
-
 if __name__ == '__main__':
-    players = []
+    game = Game(observe=True)
     current_player = None
     m_main = Menu(title="Main Menu")
     m_player = Menu(title="Manage Players")
     m_player_del = Menu(title="Edit/Delete Player")
-    set_main_options(players)
-    set_player_options(players)
-    set_player_del_options(players)
+    set_main_options(game)
+    set_player_options(game)
+    set_player_del_options(game)
     m_main.open()
@@ -0,0 +1,91 @@
+""" The cards a game is played with.
+
+    A deck is a list of categories of cards.  Cards are numbered in
+    order through the categories, a suggestion names one card of each
+    category, and the envelope holds one card of each category.  The
+    classic deck has three categories, but any number will do.
+"""
+import random
+
+class Deck:
+    """ A deck of cards in categories
+
+        categories - a list of lists of card names
+        names - the names of the categories
+    """
+
+    def __init__(self, categories, names=None):
+        self.groups = [list(c) for c in categories]
+        self.names = list(names) if names else \
+                     ['Category {}'.format(k+1) for k in range(len(self.groups))]
+        self.cards = [card for group in self.groups for card in group]
+        self.categories = []
+        start = 0
+        for group in self.groups:
+            self.categories.append(range(start, start + len(group)))
+            start += len(group)
+
+    def __len__(self):
+        return len(self.cards)
+
+    def __eq__(self, other):
+        return isinstance(other, Deck) and self.groups == other.groups \
+               and self.names == other.names
+
+    def allcardset(self):
+        """ a set containing all the cards """
+        return set(range(len(self.cards)))
+
+    def indices_to_all(self, nums):
+        """ change the indices of a zero-based query, one into each
+            category, to index into cards """
+        return [cat[n] for cat, n in zip(self.categories, nums)]
+
+    def text_query(self, nums):
+        """ get the names for a query of indices into cards """
+        return [self.cards[i] for i in nums]
+
+    def random_suggestion(self, rng=random):
+        """ a zero-based query with a random card of each category """
+        return tuple(rng.choice(range(len(cat))) for cat in self.categories)
+
+    def to_json(self):
+        return {'names': self.names, 'categories': self.groups}
+
+    @classmethod
+    def from_json(cls, data):
+        return cls(data['categories'], data['names'])
+
+def custom_deck(sizes, names=None):
+    """ A deck with the given number of cards in each category.  The
+        cards are named after their category's initial (or number if
+        the categories are not named) and their position in it.
+    """
+    names = list(names) if names else \
+            ['Category {}'.format(k+1) for k in range(len(sizes))]
+    prefixes = [n[0] for n in names] \
+               if len(set(n[0] for n in names)) == len(names) \
+               else ['{}.'.format(k+1) for k in range(len(names))]
+    return Deck([['{}{}'.format(prefix, i+1) for i in range(size)]
+                 for prefix, size in zip(prefixes, sizes)], names)
+
+CLASSIC = Deck([['Colonel Mustard', 'Mr. Green', 'Professor Plum',
+                 'Miss Scarlet', 'Ms White', 'Mrs. Peacock'],
+                ['lead pipe', 'candlestick', 'rope', 'knife',
+                 'wrench', 'pistol'],
+                ['hall', 'conservatory', 'library', 'dining room',
+                 'kitchen', 'billiard room', 'study', 'lounge',
+                 'ball room']],
+               ['Suspects', 'Weapons', 'Rooms'])
+
+MASTER_DETECTIVE = Deck([['Colonel Mustard', 'Mr. Green', 'Professor Plum',
+                          'Miss Scarlet', 'Mrs. White', 'Mrs. Peacock',
+                          'Madame Rose', 'Sergeant Gray',
+                          'Monsieur Brunette', 'Miss Peach'],
+                         ['lead pipe', 'candlestick', 'rope', 'knife',
+                          'wrench', 'revolver', 'horseshoe', 'poison'],
+                         ['carriage house', 'conservatory', 'kitchen',
+                          'trophy room', 'dining room', 'drawing room',
+                          'gazebo', 'courtyard', 'fountain', 'library',
+                          'billiard room', 'studio']],
+                        ['Suspects', 'Weapons', 'Rooms'])
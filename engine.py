@@ -0,0 +1,641 @@
+""" The clue solver without any user interface.
+
+    Nothing here reads from stdin or writes to stdout, so the solver can be
+    driven from other programs.  clue.py builds the interactive menus on
+    top of it.
+"""
+from logic_tree import *
+import instrument
+from solver import Solver
+from probability import DealCounter
+import random
+import time
+from array import array
+from collections import Counter
+from contextlib import contextmanager
+from deck import CLASSIC, MASTER_DETECTIVE, custom_deck
+
+# the classic deck, which the interactive game uses
+SUSPECTS, WEAPONS, ROOMS = CLASSIC.groups
+ALLCARDS = CLASSIC.cards
+
+NS, NW, NR = len(SUSPECTS), len(WEAPONS), len(ROOMS)
+
+# values in a player's row of the knowledge matrix
+HAS, UNKNOWN, HAS_NOT = 1, 0, -1
+
+# the seconds the solver may take after a suggestion, per card in the deck
+DEDUCE_SECONDS = 0.005
+
+class Player(speculative):
+    """ A class representing a player in the game Clue
+
+        Besides the logic tree, a player keeps its row of the knowledge
+        matrix: known[card] is HAS, HAS_NOT or UNKNOWN, and pos and neg
+        are the sets of cards known to be in and not in the hand.  The
+        row is brought up to date after every change to the tree, so
+        the deduction functions never need to intersect the branches.
+        All the players in a game share its deck.  The hand is a bittree
+        unless another tree class with the same interface is given, and
+        is labelled with the player's name for instrument's counters.
+    """
+
+    def __init__(self, name, ncards, is_cpu, knowns=None, deck=CLASSIC,
+                 tree=bittree):
+        self.name = name
+        self.ncards = ncards
+        self.is_cpu = is_cpu
+        self.deck = deck
+        self.hand = tree()
+        self.hand.label = name
+        self.true_hand = None
+        self.known = array('b', [UNKNOWN] * len(deck))
+        self.pos = set()
+        self.neg = set()
+        if self.is_cpu:
+            self.hand.add_neg(list(deck.allcardset() - set(knowns)))
+            for k in knowns:
+                self.hand.add_pos([k])
+            self.refresh()
+
+    def refresh(self):
+        """ Update the knowledge row from the tree.  Knowledge only ever
+            grows, so only the newly known cards are written.
+            Returns the set of cards newly known to be in the hand.
+        """
+        pos = self.hand.pos_elements() - self.pos
+        neg = self.hand.neg_elements() - self.neg
+        for n in pos:
+            self.known[n] = HAS
+        for n in neg:
+            self.known[n] = HAS_NOT
+        self.pos |= pos
+        self.neg |= neg
+        return pos
+
+    def has_any(self, nums):
+        """ check if the player is known to have any of the cards """
+        return any(self.known[n] == HAS for n in nums)
+
+    # All queries and cards are indices into the deck's cards
+    @instrument.timed
+    def update_for_no(self, query):
+        self.hand.add_neg(query)
+        return self.refresh()
+
+    @instrument.timed
+    def update_for_yes(self, query):
+        self.hand.add_pos(query)
+        return self.refresh()
+
+    @instrument.timed
+    def update_for_card(self, card):
+        self.hand.add_pos([card])
+        return self.refresh()
+
+    @instrument.timed
+    def update_for_queries(self, queries):
+        """ add a batch of (bval, query) pairs, as in treebase.add_queries """
+        self.hand.add_queries(queries)
+        return self.refresh()
+
+    def possibles(self):
+        """ Nested list representing disjunctions """
+        poss = self.hand.possibles()
+        return [[self.deck.cards[n] for n in sub] for sub in poss]
+
+    def state(self):
+        """ the current version of the player's knowledge (see
+            bittree.state) """
+        return self.hand.state(), frozenset(self.pos), frozenset(self.neg)
+
+    def restore(self, state):
+        """ go back to a version returned by state """
+        hand, pos, neg = state
+        self.hand.restore(hand)
+        for n in (self.pos ^ pos) | (self.neg ^ neg):
+            self.known[n] = HAS if n in pos else \
+                            HAS_NOT if n in neg else UNKNOWN
+        self.pos = set(pos)
+        self.neg = set(neg)
+
+
+@instrument.timed
+def share_cards(players, found):
+    """ Tell the other players about cards newly known to be in a hand.
+        found maps a player to the cards newly found in its hand; none of
+        the others can hold them, so each of them gets the cards it does
+        not already know about as one negative query.  Whatever that
+        reveals is passed on in turn until nothing new is found.
+        Returns the cards found along the way, by player.
+    """
+    found = {p: set(cards) for p, cards in found.items() if cards}
+    shared = {}
+    while found:
+        negs = {}
+        for p, cards in found.items():
+            shared.setdefault(p, set()).update(cards)
+            for p1 in players:
+                if p1 is not p and cards - p1.neg:
+                    negs.setdefault(p1, set()).update(cards - p1.neg)
+        found = {}
+        for p1, cards in negs.items():
+            pos = p1.update_for_no(sorted(cards))
+            if pos:
+                found[p1] = pos
+    return shared
+
+
+@instrument.timed
+def sync_players(players):
+    """ Make sure that no card known to be in one hand is missing from the
+        negatives of another.  Suggestions and new players are shared as
+        they are recorded, so this only finds something if the trees were
+        changed directly.
+    """
+    return share_cards(players, {p: p.pos for p in players})
+
+
+@instrument.timed
+def deduce(players, seconds=None):
+    """ Run the global solver over all the hands, and add anything it finds
+        to the players' trees.  Nothing is added if the trees are not
+        consistent with the number of cards each player holds.  The
+        solver stops after seconds, by default DEDUCE_SECONDS for each
+        card in the deck, so that a large deck doesn't hold up the game;
+        it then finds less, but nothing wrong, and the rest can be found
+        after a later suggestion.
+    """
+    deck = deck_of(players)
+    if seconds is None:
+        seconds = DEDUCE_SECONDS * len(deck)
+    solver = Solver(players, deck.categories,
+                    deadline=time.perf_counter() + seconds)
+    if not solver.consistent():
+        return solver
+    found = {}
+    for o, p in enumerate(players):
+        negs = deck.allcardset() - solver.possible(o) - p.neg
+        pos = p.update_for_no(sorted(negs)) if negs else set()
+        for card in solver.known(o) - p.pos:
+            pos |= p.update_for_card(card)
+        found[p] = pos
+    share_cards(players, found)
+    return solver
+
+
+def in_effect(events):
+    """ The events of a log (see eventlog) that are still in effect.  A
+        goto event moves to the game as it was after the first version
+        events in effect, as undo and redo do, and the next other event
+        drops any that were undone.
+    """
+    line = []
+    version = 0
+    for event in events:
+        if event['type'] == 'goto':
+            version = event['version']
+        else:
+            del line[version:]
+            line.append(event)
+            version += 1
+    return line[:version]
+
+def deck_of(players):
+    """ the deck the players are playing with """
+    return players[0].deck if players else CLASSIC
+
+def indices_to_all(nums, deck=CLASSIC):
+    """ change the indices of a zero-based query to index into the cards """
+    return deck.indices_to_all(nums)
+
+def text_query(nums, deck=CLASSIC):
+    """ get the names for a query """
+    return deck.text_query(nums)
+
+def allcardset(deck=CLASSIC):
+    """ a set containing all the cards """
+    return deck.allcardset()
+
+def categories(deck=CLASSIC):
+    """ the cards of each category, as indices into the cards """
+    return deck.categories
+
+
+def get_responders(players, suggester):
+    """ get the responders (in the correct order) for the given suggester """
+    si = players.index(suggester)
+    return players[si+1:] + players[:si]
+
+
+@instrument.timed
+def record_suggestion(players, suggester, query, responses):
+    """ Update the players for a suggestion and the responses to it.
+
+        query - the suggested cards, as indices into the deck's cards
+        responses - (player, response) pairs in the order the players
+            responded, where response is None if the player had none of
+            the cards, True if the player showed a card that was not seen,
+            or the index of the card that was shown
+    """
+    found = {}
+    for player, response in responses:
+        if response is None:
+            pos = player.update_for_no(query)
+        elif response is True:
+            pos = player.update_for_yes(query)
+        else:
+            pos = player.update_for_card(response)
+        found.setdefault(player, set()).update(pos)
+    share_cards(players, found)
+    return deduce(players)
+
+
+def true_responses(players, suggester, query, choose=None):
+    """ The responses to a suggestion given each player's true_hand.
+        When the CPU shows a card to another player, choose, if given, is
+        called with the suggester and the cards it could show to pick
+        one; the response is True whichever it is.
+    """
+    responses = []
+    for r in get_responders(players, suggester):
+        isect = set(query) & set(r.true_hand)
+        if len(isect) == 0:
+            responses.append((r, None))
+        else:
+            if r.is_cpu and choose and not suggester.is_cpu:
+                choose(suggester, sorted(isect))
+            responses.append((r, isect.pop() if suggester.is_cpu else True))
+            break
+    return responses
+
+
+def random_suggestion(rng=random, deck=CLASSIC):
+    """ a zero-based query with a random card of each category """
+    return deck.random_suggestion(rng)
+
+
+def deal(players, rng=random):
+    """ Deal random hands to the players' true_hand, and return
+        the zero-based query that was put in the envelope
+    """
+    deck = deck_of(players)
+    true_solution = deck.random_suggestion(rng)
+    ac = deck.allcardset()
+    ac -= set(deck.indices_to_all(true_solution))
+    ac = list(ac)
+    rng.shuffle(ac)
+    for p in players:
+        p.true_hand = ac[:p.ncards]
+        ac = ac[p.ncards:]
+        assert len(p.true_hand) == p.ncards
+    return true_solution
+
+
+def random_game(players, rng=random):
+    """ deal random hands and make up the suggestions for a game,
+        returned in the form of automate's test_data """
+    true_solution = deal(players, rng)
+    suggestions = [(i % len(players), deck_of(players).random_suggestion(rng))
+                   for i in range(100)]
+    return [p.true_hand for p in players], true_solution, suggestions
+
+
+def play(players, test_data=None, callback=None, rng=random, choose=None):
+    """ Play a game automatically with provided data or random data.
+        See clue.automate for the inputs and outputs.  If a callback is
+        given, it is called after each suggestion with the suggestion
+        number, the suggester, the query and the responses.  choose is
+        passed on to true_responses.
+    """
+    if not test_data:
+        test_data = random_game(players, rng)
+    true_hands, true_solution, suggestions = test_data
+    for player, true_hand in zip(players, true_hands):
+        player.true_hand = true_hand
+
+    for i, item in enumerate(suggestions):
+        pid, query = item
+        qset = set(deck_of(players).indices_to_all(query))
+        suggester = players[pid]
+        responses = true_responses(players, suggester, qset, choose)
+        record_suggestion(players, suggester, qset, responses)
+        if callback:
+            callback(i, suggester, qset, responses)
+        if found_solution(players): break
+    return true_solution, definite_solution_nums(players), suggestions[:i+1]
+
+
+def definite_solution(players):
+    """ The solution to the game """
+    defs = definite_solution_nums(players)
+    return [deck_of(players).cards[c] for c in defs]
+
+
+@instrument.timed
+def found_solution(players):
+    """ Indicate the game was solved """
+    return len(definite_solution(players)) == len(deck_of(players).categories)
+
+
+def likely_solution(players):
+    """ Return tuples of cards with the
+        number of players who don't have them
+    """
+    likely = likely_solution_nums(players)
+    return sorted([(deck_of(players).cards[n], ct) for n, ct in likely],
+                  key=lambda tp: tp[1], reverse=True)
+
+
+def solution_probabilities(players, seconds=None):
+    """ Return tuples of cards with the exact probability
+        that they are in the envelope, most likely first.  Counting
+        can take seconds (see DealCounter); if it takes longer than
+        seconds, None is returned instead.
+    """
+    deck = deck_of(players)
+    deadline = time.perf_counter() + seconds if seconds is not None else None
+    counter = DealCounter(players, deck.categories, deadline=deadline)
+    if not counter.complete:
+        return None
+    probs = counter.solution_probabilities()
+    return sorted([(deck.cards[n], p) for n, p in enumerate(probs) if p],
+                  key=lambda tp: tp[1], reverse=True)
+
+
+@instrument.timed
+def definite_solution_nums(players):
+    return set(n for n in deck_of(players).allcardset()
+               if all(p.known[n] == HAS_NOT for p in players))
+
+@instrument.timed
+def likely_solution_nums(players):
+    not_in_hand = Counter(n for p in players for n in p.neg)
+    return [(k,v) for k, v in not_in_hand.items()
+            if not any(p.known[k] == HAS for p in players)]
+
+def knowledge_matrix(players):
+    """ the players x cards matrix of HAS, HAS_NOT and UNKNOWN """
+    return [p.known for p in players]
+
+
+class Game:
+    """ A headless game: players, suggestions and responses go in and
+        deductions come out.  Players may be given by name or object, and
+        queries and cards are indices into the deck's cards.  With
+        history False, no versions are kept for undo, so the memory used
+        does not grow with the number of events.  With observe, each
+        opponent's view of the game is kept as well (see observer).
+    """
+
+    def __init__(self, players=None, log=None, deck=None, tree=bittree,
+                 history=True, observe=False):
+        self.players = list(players or [])
+        self.deck = deck or deck_of(self.players)
+        self.tree = tree
+        self.log = log
+        self.keep_history = history
+        self.observers = None
+        if observe:
+            from observer import Observers
+            self.observers = Observers(self.deck)
+            for p in self.players:
+                self.observers.add_player(p.name, p.ncards, p.is_cpu, p.pos)
+        self.forget()
+
+    def apply(self, event):
+        """ Make a change to the game, given as an event dict (see
+            eventlog for the kinds of event)
+        """
+        kind = event['type']
+        if kind == 'player':
+            self.players.append(Player(event['name'], event['ncards'],
+                                       event['is_cpu'], event['knowns'],
+                                       self.deck, self.tree))
+            sync_players(self.players)
+        elif kind == 'delete':
+            self.players.remove(self.player(event['name']))
+        elif kind == 'suggestion':
+            record_suggestion(self.players, self.player(event['suggester']),
+                              event['query'],
+                              [(self.player(p), r)
+                               for p, r in event['responses']])
+        else:
+            raise ValueError('Unknown event type {}'.format(kind))
+        if self.observers:
+            self.observers.apply(event)
+
+    def ingest(self, events):
+        """ Apply a batch of events, such as a whole transcript, at once.
+            The queries for each player are collected and added to the
+            tree as one batch, and the solver runs once at the end, so
+            the trees never go through the growth they see in live play.
+            The opponents' views, if kept, follow each event in turn.  Any
+            events undone by a goto are left out.  The history starts from
+            the end of the batch.
+        """
+        pending = {}
+        for event in in_effect(events):
+            if event['type'] != 'suggestion':
+                self.apply(event)
+                continue
+            if self.observers:
+                self.observers.apply(event)
+            query = event['query']
+            for name, response in event['responses']:
+                queries = pending.setdefault(self.player(name).name, [])
+                if response is None:
+                    queries.append((False, query))
+                elif response is True:
+                    queries.append((True, query))
+                else:
+                    queries.append((True, [response]))
+        found = {}
+        for player in self.players:
+            queries = pending.get(player.name)
+            if queries:
+                found[player] = player.update_for_queries(queries)
+        share_cards(self.players, found)
+        deduce(self.players)
+        self.forget()
+
+    def record(self, event):
+        """ Apply an event, add the new version of the game to the
+            history, and log the event if the game is being logged.
+            Any versions that were undone are dropped.
+        """
+        self.apply(event)
+        if self.keep_history:
+            del self.history[self.version+1:]
+            self.history.append((event, self.state()))
+            self.version += 1
+        if self.log:
+            self.log.append(event, self)
+
+    #----------------------
+    # History
+    #----------------------
+
+    def state(self):
+        """ the current version of the game: the players and their
+            versions, which share their trees with the other versions,
+            and the opponents' views if they are kept, in the same way """
+        state = tuple((p, p.state()) for p in self.players)
+        if self.observers:
+            state += ((self.observers, self.observers.state()),)
+        return state
+
+    def restore(self, state):
+        """ go back to a version returned by state """
+        self.players = [p for p, s in state if p is not self.observers]
+        for p, s in state:
+            p.restore(s)
+
+    @contextmanager
+    def speculate(self):
+        """ A block whose changes to the game are undone, history and
+            all.  Nothing done in it is logged.
+        """
+        log, history, version = self.log, list(self.history), self.version
+        self.log = None
+        try:
+            with speculation(self):
+                yield self
+        finally:
+            self.log, self.history, self.version = log, history, version
+
+    def forget(self):
+        """ start the history from the game as it stands """
+        self.history = [(None, self.state())]
+        self.version = 0
+
+    def goto(self, version):
+        """ Go to a version in the history, and log that if the game is
+            being logged.
+        """
+        self.version = version
+        self.restore(self.history[version][1])
+        if self.log:
+            self.log.goto(self)
+
+    def undo(self):
+        """ undo the last event; returns False if there is none """
+        if self.version == 0:
+            return False
+        self.goto(self.version - 1)
+        return True
+
+    def redo(self):
+        """ redo the last undone event; returns False if there is none """
+        if self.version == len(self.history) - 1:
+            return False
+        self.goto(self.version + 1)
+        return True
+
+    def suggestions(self):
+        """ the suggestion events made so far """
+        return [e for e, s in self.history[1:self.version+1]
+                if e['type'] == 'suggestion']
+
+    def rewind(self, turn):
+        """ Go back (or forward again) to the game as it was after the
+            given number of suggestions, just before the next one.
+            Returns False if there were not that many.
+        """
+        made = 0
+        for version, (event, state) in enumerate(self.history):
+            if event and event['type'] == 'suggestion':
+                made += 1
+                if made > turn:
+                    break
+            if made == turn:
+                last = version
+        if made < turn:
+            return False
+        self.goto(last)
+        return True
+
+    def add_player(self, name, ncards, is_cpu=False, knowns=None):
+        """ add a player in turn order; the CPU player's knowns are
+            the cards in its hand """
+        self.record({'type': 'player', 'name': name, 'ncards': ncards,
+                     'is_cpu': is_cpu,
+                     'knowns': list(knowns) if knowns is not None else None})
+        return self.players[-1]
+
+    def remove_player(self, player):
+        self.record({'type': 'delete', 'name': self.player(player).name})
+
+    def player(self, player):
+        """ the player with the given name, or the player itself """
+        if isinstance(player, Player):
+            return player
+        return next(p for p in self.players if p.name == player)
+
+    def suggest(self, suggester, query, responses, shown=None):
+        """ Record a suggestion and the responses to it, given as
+            (player, response) pairs as in record_suggestion.  shown is
+            the card the CPU showed, if it showed one.
+        """
+        event = {'type': 'suggestion',
+                 'suggester': self.player(suggester).name,
+                 'query': list(query),
+                 'responses': [[self.player(p).name, r]
+                               for p, r in responses]}
+        if shown is not None:
+            event['shown'] = shown
+        self.record(event)
+
+    def advise(self, suggester, query):
+        """ The card the CPU should show the suggester, of those it holds
+            in the query, or None if it holds none.  With the opponents'
+            views it is the card that tells the suggester least (see
+            Observers.advise), and otherwise the first.
+        """
+        cpu = next((p for p in self.players if p.is_cpu), None)
+        cards = sorted(set(query) & cpu.pos) if cpu else []
+        if not cards:
+            return None
+        if self.observers and self.observers.cpu:
+            return self.observers.advise(suggester, cards)[0]
+        return cards[0]
+
+    def responders(self, suggester):
+        """ the players who respond to the suggester, in order """
+        return get_responders(self.players, self.player(suggester))
+
+    #----------------------
+    # Deductions
+    #----------------------
+
+    def definite_solution(self):
+        return definite_solution(self.players)
+
+    def definite_solution_nums(self):
+        return definite_solution_nums(self.players)
+
+    def found_solution(self):
+        return found_solution(self.players)
+
+    def likely_solution(self):
+        return likely_solution(self.players)
+
+    def solution_probabilities(self):
+        return solution_probabilities(self.players)
+
+    def knowledge_matrix(self):
+        return knowledge_matrix(self.players)
+
+    def accuse(self, budget=1.0, confidence=0.95):
+        """ the most probable solution within budget seconds (see accuse) """
+        from accuse import accuse
+        return accuse(self.players, budget, confidence)
+
+    def progress(self, observer):
+        """ how close an opponent is to solving (see Observers.progress) """
+        return self.observers.progress(self.player(observer).name)
+
+    def hand(self, player):
+        """ the cards the player is known to have and not to have """
+        player = self.player(player)
+        return set(player.pos), set(player.neg)
@@ -0,0 +1,235 @@
+""" Saving a game as an append-only log of events, with snapshots.
+
+    Each change to a game is an event: a small dict that is written to
+    the log as one line of JSON as soon as it happens, so saving costs
+    the same however large the trees grow.  Every so often the state of
+    the players, trees included, is written to a snapshot along with the
+    number of events it covers.  Loading reads the snapshot and replays
+    only the events logged after it.  The log doubles as a record of the
+    session that can be read or replayed from the start (see in_effect).
+
+    The events are
+        {"type": "player", "name": ..., "ncards": ..., "is_cpu": ...,
+         "knowns": [...] or null}
+        {"type": "delete", "name": ...}
+        {"type": "suggestion", "suggester": ..., "query": [...],
+         "responses": [[name, response], ...], "shown": card}
+        {"type": "goto", "version": n}
+    where a response is as in record_suggestion: null, true or a card,
+    and shown, which may be left out, is the card the CPU showed.  A
+    goto is an undo, redo or rewind: it goes to the game as it was after
+    the first n events in effect, counted from the start of the log.
+"""
+import json
+import os
+from deck import Deck
+from engine import Game, Player, in_effect
+from logic_tree import atom, bits, nums, tree, bittree, cnftree, budgettree
+
+def hand_state(hand):
+    """ a tree as a JSON-ready dict """
+    if isinstance(hand, cnftree):
+        state = {'tree': type(hand).__name__, 'pos': hand.pos,
+                 'neg': hand.neg, 'clauses': hand.clauses,
+                 'consistent': hand.consistent}
+        if isinstance(hand, budgettree):
+            state['budget'] = hand.budget
+        return state
+    if isinstance(hand, tree):
+        return {'tree': 'tree',
+                'branches': [[bits(a.num for a in b if a.bval),
+                              bits(a.num for a in b if not a.bval)]
+                             for b in hand.branches]}
+    return {'tree': type(hand).__name__,
+            'branches': [list(b) for b in hand.branches]}
+
+def restore_hand(state):
+    """ the tree saved by hand_state """
+    if state['tree'] in ('cnftree', 'budgettree'):
+        hand = budgettree(state['budget']) \
+               if state['tree'] == 'budgettree' else cnftree()
+        hand.pos = state['pos']
+        hand.neg = state['neg']
+        hand.clauses = state['clauses']
+        hand.consistent = state['consistent']
+    elif state['tree'] == 'tree':
+        hand = tree()
+        hand.branches = [frozenset(atom(n, True) for n in nums(pos))
+                         | frozenset(atom(n, False) for n in nums(neg))
+                         for pos, neg in state['branches']]
+    else:
+        if state['tree'] == 'nptree':
+            from nptree import nptree as hand_tree
+        else:
+            hand_tree = bittree
+        hand = hand_tree()
+        hand.branches = [tuple(b) for b in state['branches']]
+    return hand
+
+def player_state(player):
+    return {'name': player.name, 'ncards': player.ncards,
+            'is_cpu': player.is_cpu, 'hand': hand_state(player.hand)}
+
+def restore_player(state, deck):
+    player = Player(state['name'], state['ncards'], False, deck=deck)
+    player.hand = restore_hand(state['hand'])
+    player.hand.label = player.name
+    player.is_cpu = state['is_cpu']
+    player.refresh()
+    return player
+
+def observers_state(observers):
+    """ the opponents' views as a JSON-ready dict """
+    return {'cpu': observers.cpu, 'cpu_hand': sorted(observers.cpu_hand),
+            'players': [list(p) for p in observers.players],
+            'views': {o: [[list(b) for b in p.hand.branches] for p in view]
+                      for o, view in observers.views.items()}}
+
+def restore_observers(state, deck):
+    from observer import Observers
+    observers = Observers(deck)
+    observers.cpu = state['cpu']
+    observers.cpu_hand = set(state['cpu_hand'])
+    observers.players = [tuple(p) for p in state['players']]
+    for o, hands in state['views'].items():
+        view = observers.views[o] = []
+        for (name, ncards), branches in zip(observers.players, hands):
+            p = observers.hand(name, ncards)
+            p.hand.branches = observers.store.intern(
+                [tuple(b) for b in branches])
+            p.refresh()
+            view.append(p)
+    return observers
+
+class EventLog:
+    """ The log and snapshot of a game, kept in path + '.log' and
+        path + '.snap'.  A snapshot is written every snapshot_every
+        events.  A line left half written by a crash is ignored.
+    """
+
+    def __init__(self, path, snapshot_every=20):
+        self.logpath = path + '.log'
+        self.snappath = path + '.snap'
+        self.snapshot_every = snapshot_every
+        self.events = 0
+        self.base = 0
+
+    def start(self, game):
+        """ Begin a new log with a snapshot of the game as it stands,
+            and log the game's events from now on.  The game's history
+            starts from the snapshot too, since an undo can't be logged
+            past the start of the log.
+        """
+        open(self.logpath, 'w').close()
+        self.events = 0
+        self.base = 0
+        game.forget()
+        self.snapshot(game)
+        game.log = self
+
+    def append(self, event, game):
+        """ log an event that has been applied to the game """
+        with open(self.logpath, 'a') as f:
+            f.write(json.dumps(event) + '\n')
+        self.events += 1
+        if self.events % self.snapshot_every == 0:
+            self.snapshot(game)
+
+    def goto(self, game):
+        """ Log a move through the game's history, which has been made,
+            and snapshot the game.  Versions in the log are counted
+            from its start, which is base versions before the start of
+            the game's history.
+        """
+        with open(self.logpath, 'a') as f:
+            f.write(json.dumps({'type': 'goto',
+                                'version': self.base + game.version}) + '\n')
+        self.events += 1
+        self.snapshot(game)
+
+    def snapshot(self, game):
+        """ Write the state of the game.  The snapshot is written to a
+            temporary file and renamed, so a crash leaves the old one.
+        """
+        tmp = self.snappath + '.tmp'
+        snap = {'events': self.events,
+                'version': self.base + game.version,
+                'deck': game.deck.to_json(),
+                'players': [player_state(p) for p in game.players]}
+        if game.observers:
+            snap['observers'] = observers_state(game.observers)
+        with open(tmp, 'w') as f:
+            json.dump(snap, f)
+        os.replace(tmp, self.snappath)
+
+    def read(self, repair=False):
+        """ The logged events, in order.  With repair, a half written
+            line at the end is cut off so that new events follow the
+            good ones.
+        """
+        events = []
+        good = 0
+        if os.path.exists(self.logpath):
+            with open(self.logpath, 'rb') as f:
+                for line in f:
+                    try:
+                        events.append(json.loads(line))
+                    except ValueError:
+                        break
+                    good += len(line)
+            if repair and good < os.path.getsize(self.logpath):
+                with open(self.logpath, 'r+b') as f:
+                    f.truncate(good)
+        return events
+
+    def load(self, observe=False):
+        """ Rebuild the game from the snapshot and the events logged
+            after it, and log the game's events from now on.  The
+            history starts from the snapshot.  With observe, the
+            opponents' views are kept, starting from those in the
+            snapshot if it has them.
+        """
+        game = Game(observe=observe)
+        covered = 0
+        if os.path.exists(self.snappath):
+            with open(self.snappath) as f:
+                snap = json.load(f)
+            game.deck = Deck.from_json(snap['deck'])
+            game.players = [restore_player(p, game.deck)
+                            for p in snap['players']]
+            if game.players:
+                game.tree = type(game.players[0].hand)
+            if observe and 'observers' in snap:
+                game.observers = restore_observers(snap['observers'],
+                                                   game.deck)
+            elif observe:
+                game.observers.deck = game.deck
+                for p in game.players:
+                    game.observers.add_player(p.name, p.ncards, p.is_cpu,
+                                              p.pos)
+            game.forget()
+            covered = snap['events']
+            self.base = snap.get('version', covered)
+        events = self.read(repair=True)
+        for event in events[covered:]:
+            if event['type'] == 'goto':
+                # a goto is snapshotted as it is logged, so one only
+                # follows the snapshot if a crash cut the snapshot short
+                if 0 <= event['version'] - self.base < len(game.history):
+                    game.goto(event['version'] - self.base)
+            else:
+                game.record(event)
+        self.events = len(events)
+        game.log = self
+        return game
+
+    def replay(self):
+        """ Rebuild the game by replaying the events in effect in the
+            whole log as one batch, for a log begun with an empty game.
+        """
+        game = Game()
+        if os.path.exists(self.snappath):
+            with open(self.snappath) as f:
+                game.deck = Deck.from_json(json.load(f)['deck'])
+        game.ingest(self.read())
+        return game
@@ -0,0 +1,21 @@
+""" A small game shared by the solver, probability and sampler tests:
+    eight cards in three categories, and three players holding 2, 2
+    and 1 of them.
+"""
+from collections import namedtuple
+from logic_tree import bittree
+
+owner = namedtuple('owner', ['ncards', 'hand'])
+
+CATEGORIES = [range(0, 3), range(3, 5), range(5, 8)]
+
+def players_with(*updates, tree=bittree):
+    """ three players with 2, 2 and 1 cards; updates are
+        (player index, positive?, query) """
+    players = [owner(2, tree()), owner(2, tree()), owner(1, tree())]
+    for i, pos, query in updates:
+        if pos:
+            players[i].hand.add_pos(query)
+        else:
+            players[i].hand.add_neg(query)
+    return players
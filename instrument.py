@@ -0,0 +1,112 @@
+""" Opt-in counters and timings for the hot paths.
+
+    Instrumentation is off unless the CLUE_INSTRUMENT environment
+    variable is set (to the file the counters are dumped to) or enable()
+    is called.  While it is off, each instrumented call costs one extra
+    function call and a test of a global.
+
+    Tree updates are counted per tree, under the tree's label (the name of
+    the player whose hand it is) or else its class name: the branches
+    before and after, the copies pruned as contradictions, dropped as
+    duplicates and absorbed by smaller branches, and the time taken.
+    Other functions are timed under their qualified names.
+"""
+import functools
+import json
+import os
+import sys
+from collections import defaultdict
+from time import perf_counter
+
+path = os.environ.get('CLUE_INSTRUMENT')
+enabled = bool(path)
+trees = defaultdict(lambda: defaultdict(lambda: defaultdict(int)))
+calls = defaultdict(lambda: defaultdict(float))
+
+def enable(dump_path=None):
+    """ turn instrumentation on, dumping to dump_path if given """
+    global enabled, path
+    enabled = True
+    path = dump_path or path
+
+def disable():
+    global enabled
+    enabled = False
+
+def reset():
+    trees.clear()
+    calls.clear()
+
+def tree_update(method):
+    """ Decorator for a tree's add_pos and add_neg, for trees whose len
+        is their number of branches.  The method may leave
+        (made, pruned, deduplicated) in the tree's last_update, where
+        made is the number of branch copies it made; if it doesn't, none
+        were dropped.  Methods need only do that while instrumentation
+        is on.
+    """
+    name = method.__name__
+
+    @functools.wraps(method)
+    def wrapper(self, query):
+        if not enabled:
+            return method(self, query)
+        before = len(self)
+        self.last_update = None
+        start = perf_counter()
+        result = method(self, query)
+        seconds = perf_counter() - start
+        after = len(self)
+        made, pruned, deduplicated = self.last_update or (after, 0, 0)
+        record = trees[getattr(self, 'label', type(self).__name__)][name]
+        record['calls'] += 1
+        record['seconds'] += seconds
+        record['branches_before'] += before
+        record['branches_after'] += after
+        record['max_branches'] = max(record['max_branches'], after)
+        record['pruned'] += pruned
+        record['deduplicated'] += deduplicated
+        record['absorbed'] += made - pruned - deduplicated - after
+        return result
+    return wrapper
+
+def timed(function):
+    """ Decorator that counts the calls to a function and times them.
+        Methods of a Player are counted per player.
+    """
+    name = function.__qualname__
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        if not enabled:
+            return function(*args, **kwargs)
+        start = perf_counter()
+        result = function(*args, **kwargs)
+        key = name
+        if args and hasattr(args[0], 'hand') and hasattr(args[0], 'name'):
+            key = '{}[{}]'.format(name, args[0].name)
+        record = calls[key]
+        record['calls'] += 1
+        record['seconds'] += perf_counter() - start
+        return result
+    return wrapper
+
+def report():
+    """ the counters as a dict """
+    return {'trees': {label: {op: dict(r) for op, r in ops.items()}
+                      for label, ops in trees.items()},
+            'calls': {name: dict(r) for name, r in calls.items()}}
+
+def dump(out=None):
+    """ Write the counters as JSON to a file name or file object, by
+        default the dump path, or stderr if there is none
+    """
+    out = out or path
+    if out is None:
+        out = sys.stderr
+    if isinstance(out, str):
+        with open(out, 'w') as f:
+            json.dump(report(), f, indent=2)
+    else:
+        json.dump(report(), out, indent=2)
+        out.write('\n')
@@ -1,5 +1,7 @@
 from itertools import product
 from collections import namedtuple
+from contextlib import contextmanager
+import instrument
 
 class atom(namedtuple('atom',['num','bval'])):
     """ Represents an integer with an associated boolean value
@@ -10,36 +12,144 @@ class atom(namedtuple('atom',['num','bval'])):
     def __repr__(self):
         return '({},{})'.format(self.num, self.bval)
 
-class tree:
+def unique(branches):
+    """ The branches without duplicates, in the order they first appear.
+        Branches are hashable, so each one is checked against the ones
+        already kept in constant time as it arrives.
+    """
+    return list(dict.fromkeys(branches))
+
+def unique_counted(tree, copies, made):
+    """ unique(copies), for a tree update that made copies of the
+        branches and left out the ones that contradict themselves.
+        While instrument is on, how many were made, pruned and dropped
+        as duplicates is noted in tree.last_update.
+    """
+    if not instrument.enabled:
+        return unique(copies)
+    copies = list(copies)
+    branches = unique(copies)
+    tree.last_update = (made, made - len(copies), len(copies) - len(branches))
+    return branches
+
+@contextmanager
+def speculation(*objects):
+    """ Roll back whatever is done to the objects within the block.
+        Anything with state and restore can be used, such as trees and
+        players (for a game, Game.speculate undoes its history too).
+        Versions share what didn't change, so a what-if costs only the
+        updates made in the block and not a copy of the tree.
+    """
+    states = [(o, o.state()) for o in objects]
+    try:
+        yield objects[0] if len(objects) == 1 else objects
+    finally:
+        for o, s in states:
+            o.restore(s)
+
+def order_queries(queries):
+    """ Order a batch of (bval, query) pairs to keep the tree small while
+        they are added.  All the negative queries come first, as one
+        query, since they only ever remove branches.  The positive
+        queries follow, shortest first, so the single cards go in before
+        any disjunction copies the branches.  Cards that are already
+        known not to be in the hand are left out of the positive queries,
+        and a positive query with a card already known to be in the hand
+        is left out altogether, since the copies they would make are
+        pruned or absorbed anyway.  The tree comes out the same.  A
+        positive query left with no cards contradicts the rest, and goes
+        last so that the tree ends up with no branches.
+    """
+    neg = set()
+    positives = []
+    for bval, query in queries:
+        if bval:
+            positives.append(query)
+        else:
+            neg |= set(query)
+    ordered = [(False, sorted(neg))] if neg else []
+    pos = set()
+    for query in sorted((sorted(set(q) - neg) for q in positives),
+                        key=lambda q: (not q, len(q))):
+        if not pos & set(query):
+            ordered.append((True, query))
+            if len(query) == 1:
+                pos |= set(query)
+    return ordered
+
+class speculative:
+    """ A base for anything with state and restore, such as the trees and
+        players
+    """
+
+    def speculate(self):
+        """ a block whose changes are undone, e.g.
+                with player.speculate():
+                    player.update_for_yes(query)
+                    ...
+            (see speculation) """
+        return speculation(self)
+
+class treebase(speculative):
+    """ What the trees have in common, in terms of add_pos and add_neg """
+
+    def add_queries(self, queries):
+        """ Add a batch of (bval, query) pairs, where bval is True for a
+            positive query, in the order given by order_queries.
+        """
+        for bval, query in order_queries(queries):
+            if bval:
+                self.add_pos(query)
+            else:
+                self.add_neg(query)
+
+class tree(treebase):
     """ A logic tree customized for use by the clue solver.
-        It is implemented as a list of sets, where each set
-        represents a branch of a tree
+        It is implemented as a list of frozensets, where each frozenset
+        represents a branch of a tree.  Equal branches are equal
+        frozensets whatever order their atoms were added in, so
+        duplicates are dropped as the branches are made.
     """
 
     def __init__(self):
         self.branches = []
 
+    def __len__(self):
+        return len(self.branches)
+
+    @instrument.tree_update
     def add_pos(self, query):
         """ Add a query (tuple) positively to the tree.  This results in
             a copy of each existing branch for each atom in the disjunction.
             Multiple references to a given atom are created in the process.
+            Copies that contradict themselves or repeat another are never
+            kept.
         """
-        self.branches = [b | set((atom(q, True),))
-                             for b in self.branches for q in query] \
-                        if self.branches else [set((atom(q, True),)) for q in query]
-        self.prune()
-        self.clean()
+        if self.branches:
+            self.branches = unique_counted(
+                self, (b | {atom(q, True)}
+                       for b in self.branches for q in query
+                       if atom(q, False) not in b),
+                len(self.branches) * len(query))
+        else:
+            self.branches = unique(frozenset((atom(q, True),)) for q in query)
+        self.absorb()
 
+    @instrument.tree_update
     def add_neg(self, query):
         """ Add a query (tuple) negatively to the tree.  A chain of negative
             atoms is created for the conjunction.  It is then and unioned 
             with each existing branch.
         """
-        qset = set(atom(q, False) for q in query)
-        self.branches = [b | qset for b in self.branches] \
-                        if self.branches else [qset]
-        self.prune()
-        self.clean()
+        qset = frozenset(atom(q, False) for q in query)
+        yes = frozenset(atom(q, True) for q in query)
+        if self.branches:
+            self.branches = unique_counted(
+                self, (b | qset for b in self.branches if not b & yes),
+                len(self.branches))
+        else:
+            self.branches = [qset]
+        self.absorb()
 
     def contr(self, branch):
         """ Check if a branch contains one or more logical contradictions.
@@ -54,9 +164,35 @@ class tree:
         self.branches = [b for b in self.branches if not self.contr(b)]
 
     def clean(self):
-        """ Remove duplicate branches.  
+        """ Remove duplicate branches.  Updates never make any, so this
+            is only needed after setting the branches directly.
+        """
+        self.branches = unique(self.branches)
+
+    def absorb(self):
+        """ Remove branches that are supersets of another branch, since
+            they are logically redundant.  Branches are visited smallest
+            first, and the kept ones are indexed by their smallest num,
+            so a branch is only compared with kept branches that could
+            be a subset of it.
         """
-        self.branches = [set(b) for b in set([tuple(b) for b in self.branches])]
+        kept = {}
+        branches = []
+        for b in sorted(self.branches, key=len):
+            cards = {a.num for a in b}
+            if any(k < b for n in cards | {None} for k in kept.get(n, ())):
+                continue
+            kept.setdefault(min(cards, default=None), []).append(b)
+            branches.append(b)
+        self.branches = branches
+
+    def state(self):
+        """ the current version of the tree (see bittree.state) """
+        return self.branches
+
+    def restore(self, state):
+        """ go back to a version returned by state """
+        self.branches = state
 
     #---------------------------
     # Information about the tree
@@ -68,7 +204,8 @@ class tree:
 
     def common_elements(self):
         """ get a set of the atoms common to all branches """
-        return set.intersection(*self.branches) if self.branches else set()
+        return set(frozenset.intersection(*self.branches)) \
+                if self.branches else set()
 
     def possibles(self):
         """ get a nested list representing the disjuctive part of the tree 
@@ -99,3 +236,354 @@ class tree:
             to see if any are included
         """
         return self.pos_elements() & set(nums)
+
+
+def bits(nums):
+    """ a bitmask with the bit for each of the given nums set """
+    mask = 0
+    for n in nums:
+        mask |= 1 << n
+    return mask
+
+def nums(mask):
+    """ the nums whose bits are set in the given mask, in ascending order """
+    result = []
+    while mask:
+        low = mask & -mask
+        result.append(low.bit_length() - 1)
+        mask ^= low
+    return result
+
+def popcount(branch):
+    """ the number of atoms in a (pos, neg) branch """
+    pos, neg = branch
+    return bin(pos).count('1') + bin(neg).count('1')
+
+class bittree(treebase):
+    """ A logic tree with the same interface as tree, but much more compact.
+        Each branch is a pair of integer bitmasks (pos, neg): bit n of pos
+        stands for atom(n, True) and bit n of neg for atom(n, False).
+    """
+
+    def __init__(self):
+        self.branches = []
+
+    def __len__(self):
+        return len(self.branches)
+
+    @instrument.tree_update
+    def add_pos(self, query):
+        """ Add a query (tuple) positively to the tree.  Each existing branch
+            is copied once for each card in the disjunction, leaving out
+            copies that contradict themselves or repeat another.
+        """
+        qbits = [1 << q for q in query]
+        if self.branches:
+            self.branches = unique_counted(
+                self, ((pos | q, neg)
+                       for pos, neg in self.branches for q in qbits
+                       if not q & neg),
+                len(self.branches) * len(qbits))
+        else:
+            self.branches = unique((q, 0) for q in qbits)
+        self.absorb()
+
+    @instrument.tree_update
+    def add_neg(self, query):
+        """ Add a query (tuple) negatively to the tree.  The conjunction of
+            negative atoms is or'ed into the neg mask of each branch.
+        """
+        qbits = bits(query)
+        if self.branches:
+            self.branches = unique_counted(
+                self, ((pos, neg | qbits)
+                       for pos, neg in self.branches
+                       if not pos & qbits),
+                len(self.branches))
+        else:
+            self.branches = [(0, qbits)]
+        self.absorb()
+
+    def contr(self, branch):
+        """ Check if a branch contains one or more logical contradictions,
+            i.e. a card that is both in and not in the hand.
+        """
+        pos, neg = branch
+        return pos & neg
+
+    def prune(self):
+        """ remove any branches with contradictions """
+        self.branches = [b for b in self.branches if not self.contr(b)]
+
+    def clean(self):
+        """ Remove duplicate branches.  Updates never make any, so this
+            is only needed after setting the branches directly.
+        """
+        self.branches = unique(self.branches)
+
+    def absorb(self):
+        """ Remove branches that are supersets of another branch, since
+            they are logically redundant.  Branches are visited smallest
+            first, and the kept ones are indexed by their lowest pos bit,
+            so a branch is only compared with kept branches that could
+            be a subset of it.
+        """
+        def subsumed(pos, neg):
+            for low in [0] + [1 << n for n in nums(pos)]:
+                for p, n in kept.get(low, ()):
+                    if not (p & ~pos or n & ~neg):
+                        return True
+            return False
+
+        kept = {}
+        branches = []
+        for pos, neg in sorted(self.branches, key=popcount):
+            if not subsumed(pos, neg):
+                kept.setdefault(pos & -pos, []).append((pos, neg))
+                branches.append((pos, neg))
+        self.branches = branches
+
+    def state(self):
+        """ The current version of the tree.  Updates never change a
+            branch list in place but build a new one, and the branches
+            themselves are immutable, so a version is just the list.
+            Versions share all their branches with each other and with
+            the tree, and cost nothing until the tree changes.
+        """
+        return self.branches
+
+    def restore(self, state):
+        """ go back to a version returned by state """
+        self.branches = state
+
+    #---------------------------
+    # Information about the tree
+    #---------------------------
+
+    def atoms(self, branch):
+        """ the set of atoms represented by a branch """
+        pos, neg = branch
+        return set(atom(n, True) for n in nums(pos)) \
+                | set(atom(n, False) for n in nums(neg))
+
+    def print(self):
+        for b in self.branches:
+            print(sorted(list(self.atoms(b)), key=lambda a: a.num))
+
+    def common_masks(self):
+        """ get the (pos, neg) masks common to all branches """
+        if not self.branches: return 0, 0
+        pos, neg = self.branches[0]
+        for p, n in self.branches:
+            pos &= p
+            neg &= n
+        return pos, neg
+
+    def common_elements(self):
+        """ get a set of the atoms common to all branches """
+        return self.atoms(self.common_masks())
+
+    def possibles(self):
+        """ get a nested list representing the disjuctive part of the tree 
+            bvals are not included since they will always be True
+            inner and outer lists are sorted in ascending order
+        """
+        if not self.branches: return []
+        cpos, cneg = self.common_masks()
+        diff = [(pos & ~cpos, neg & ~cneg) for pos, neg in self.branches]
+        return sorted([sorted(nums(pos) + nums(neg))
+                       for pos, neg in diff if pos or neg])
+
+    def simple(self):
+        """ return a simple representation of the tree """
+        return sorted(list(self.common_elements()), 
+                key=lambda a: a.num) + self.possibles() \
+                if self.branches else []
+
+    def pos_elements(self):
+        """ the common atoms with bval True """
+        return set(nums(self.common_masks()[0]))
+
+    def neg_elements(self):
+        """ the common atoms with bval False """
+        return set(nums(self.common_masks()[1]))
+
+    def contains_any(self, nums):
+        """ compare the positive common atoms with the given enumerable 
+            to see if any are included
+        """
+        pos = self.common_masks()[0]
+        return {n for n in nums if pos >> n & 1}
+
+class cnftree(treebase):
+    """ A lazy logic tree with the same interface as tree.  Positive queries
+        are kept as clauses (bitmasks of cards, at least one of which is in
+        the hand) and negative queries as unit facts.  Clauses are
+        simplified by unit propagation as they arrive, and the branches
+        are only expanded when they are asked for.  The expansion is
+        cached until the next update.
+    """
+
+    def __init__(self):
+        self.pos = 0
+        self.neg = 0
+        self.clauses = []
+        self.consistent = True
+        self.expanded = None
+
+    def add_pos(self, query):
+        """ Add a query (tuple) positively to the tree as a clause """
+        self.clauses = self.clauses + [bits(query)]
+        self.propagate()
+
+    def add_neg(self, query):
+        """ Add a query (tuple) negatively to the tree as unit facts """
+        self.neg |= bits(query)
+        self.propagate()
+
+    def propagate(self):
+        """ Simplify the clauses using the unit facts.  Satisfied clauses are
+            dropped, negative cards are removed from the rest, and clauses
+            left with a single card become positive facts.  Clauses that
+            are supersets of another clause are dropped as well.
+        """
+        self.expanded = None
+        changed = True
+        while changed:
+            changed = False
+            clauses = []
+            for c in self.clauses:
+                if c & self.pos:
+                    continue
+                c &= ~self.neg
+                if c & (c - 1):
+                    clauses.append(c)
+                elif c:
+                    self.pos |= c
+                    changed = True
+                else:
+                    self.consistent = False
+            self.clauses = clauses
+        if self.pos & self.neg:
+            self.consistent = False
+        kept = []
+        for c in sorted(set(self.clauses), key=lambda c: bin(c).count('1')):
+            if not any(k & c == k for k in kept):
+                kept.append(c)
+        self.clauses = kept
+
+    def expand(self):
+        """ the clauses expanded into a bittree, most constrained first """
+        if self.expanded is None:
+            self.expanded = bittree()
+            if self.consistent and (self.pos or self.neg or self.clauses):
+                self.expanded.branches = [(self.pos, self.neg)]
+                for c in self.clauses:
+                    self.expanded.add_pos(nums(c))
+        return self.expanded
+
+    @property
+    def branches(self):
+        return self.expand().branches
+
+    def state(self):
+        """ The current version of the tree.  The clause list is never
+            changed in place, so it is shared with the tree.
+        """
+        return self.pos, self.neg, self.clauses, self.consistent, \
+               self.expanded
+
+    def restore(self, state):
+        """ go back to a version returned by state """
+        self.pos, self.neg, self.clauses, self.consistent, \
+            self.expanded = state
+
+    #---------------------------
+    # Information about the tree
+    #---------------------------
+
+    def print(self):
+        self.expand().print()
+
+    def common_elements(self):
+        """ get a set of the atoms common to all branches.  These are just
+            the unit facts, since clauses of two or more positive cards
+            never force any card in or out of the hand.
+        """
+        return self.expand().atoms((self.pos, self.neg)) \
+                if self.consistent else set()
+
+    def possibles(self):
+        """ get a nested list representing the disjuctive part of the tree 
+            inner and outer lists are sorted in ascending order
+        """
+        return self.expand().possibles()
+
+    def simple(self):
+        """ return a simple representation of the tree """
+        return self.expand().simple()
+
+    def pos_elements(self):
+        """ the common atoms with bval True """
+        return set(nums(self.pos)) if self.consistent else set()
+
+    def neg_elements(self):
+        """ the common atoms with bval False """
+        return set(nums(self.neg)) if self.consistent else set()
+
+    def contains_any(self, nums):
+        """ compare the positive common atoms with the given enumerable 
+            to see if any are included
+        """
+        return self.pos_elements() & set(nums)
+
+
+# branches a budgettree expands its clauses into at most
+BRANCH_BUDGET = 5000
+
+class budgettree(cnftree):
+    """ A cnftree that keeps its branches within a budget.  The clauses
+        are expanded smallest first, and a clause that could take the
+        expansion past budget branches is left pending instead.  The
+        branches are then a coarser tree, with the exact common elements
+        but only some of the disjunctions, so what they imply is still
+        true but not all that the clauses imply.  The expansion is made
+        again after each update, so pending clauses are taken back in
+        as negatives shrink the tree.  While any are pending, the tree is
+        degraded.
+    """
+
+    def __init__(self, budget=BRANCH_BUDGET):
+        super().__init__()
+        self.budget = budget
+        self.pending = []
+
+    def expand(self):
+        """ the clauses expanded into a bittree as far as the budget allows """
+        if self.expanded is None:
+            self.expanded = bittree()
+            self.pending = []
+            if self.consistent and (self.pos or self.neg or self.clauses):
+                self.expanded.branches = [(self.pos, self.neg)]
+                for c in self.clauses:
+                    if len(self.expanded.branches) * bin(c).count('1') \
+                            <= self.budget:
+                        self.expanded.add_pos(nums(c))
+                    else:
+                        self.pending.append(c)
+        return self.expanded
+
+    @property
+    def degraded(self):
+        """ whether some clauses are left out of the branches """
+        self.expand()
+        return bool(self.pending)
+
+    def state(self):
+        """ the current version of the tree (see cnftree.state) """
+        return super().state() + (self.pending,)
+
+    def restore(self, state):
+        """ go back to a version returned by state """
+        super().restore(state[:-1])
+        self.pending = state[-1]
@@ -0,0 +1,260 @@
+""" A logic tree backed by NumPy arrays.
+
+    Requires numpy.
+"""
+import numpy as np
+import instrument
+from logic_tree import atom, nums, treebase
+
+WORD = 64
+
+def word_mask(query, width):
+    """ the cards in a query as an array of width 64 bit words """
+    mask = np.zeros(width, dtype=np.uint64)
+    for q in query:
+        mask[q // WORD] |= np.uint64(1) << np.uint64(q % WORD)
+    return mask
+
+def to_int(words):
+    """ an array of 64 bit words as one int bitmask """
+    result = 0
+    for i, w in enumerate(words):
+        result |= int(w) << (WORD * i)
+    return result
+
+def from_int(mask, width):
+    """ an int bitmask as an array of width 64 bit words """
+    return np.array([(mask >> (WORD * i)) & (2**WORD - 1)
+                     for i in range(width)], dtype=np.uint64)
+
+def unpack(words):
+    """ a (branches, words) array as a (branches, cards) bool array """
+    little = words.astype('<u8').view(np.uint8)
+    return np.unpackbits(little, axis=1, bitorder='little').astype(bool)
+
+def lowest_bits(words):
+    """ the lowest set bit in each row of a (branches, words) array,
+        or -1 for the rows with none """
+    nonzero = words != 0
+    first = nonzero.argmax(axis=1)
+    word = words[np.arange(len(words)), first]
+    low = word & (~word + np.uint64(1))
+    index = first * WORD + np.log2(np.maximum(low, 1)).astype(int)
+    return np.where(nonzero.any(axis=1), index, -1)
+
+class nptree(treebase):
+    """ A logic tree with the same interface as tree, holding all of its
+        branches in two arrays of 64 bit words, pos and neg, with a row
+        per branch.  Bit n of a row of pos stands for atom(n, True) and
+        of neg for atom(n, False), as in bittree.  The updates work on
+        whole arrays at a time: add_neg ors the query into every row,
+        add_pos repeats the rows and sets one card in each copy, prune
+        drops the rows where pos and neg meet, and clean and absorb
+        compare rows in bulk.  Arrays are never changed in place, so
+        versions of the tree share them.
+    """
+
+    def __init__(self):
+        self.pos = np.zeros((0, 1), dtype=np.uint64)
+        self.neg = np.zeros((0, 1), dtype=np.uint64)
+
+    def __len__(self):
+        return len(self.pos)
+
+    def widen(self, query):
+        """ make the rows wide enough for the cards in the query """
+        width = max(query, default=0) // WORD + 1
+        extra = width - self.pos.shape[1]
+        if extra > 0:
+            self.pos = np.pad(self.pos, ((0, 0), (0, extra)))
+            self.neg = np.pad(self.neg, ((0, 0), (0, extra)))
+
+    @instrument.tree_update
+    def add_pos(self, query):
+        """ Add a query (tuple) positively to the tree.  Each existing branch
+            is copied once for each card in the disjunction.
+        """
+        query = list(query)
+        self.widen(query)
+        width = self.pos.shape[1]
+        masks = np.array([word_mask([q], width) for q in query],
+                         dtype=np.uint64).reshape(len(query), width)
+        if len(self.pos):
+            nbranches = len(self.pos)
+            self.pos = np.repeat(self.pos, len(query), axis=0) \
+                       | np.tile(masks, (nbranches, 1))
+            self.neg = np.repeat(self.neg, len(query), axis=0)
+        else:
+            self.pos = masks
+            self.neg = np.zeros_like(masks)
+        self.drop_copies()
+
+    @instrument.tree_update
+    def add_neg(self, query):
+        """ Add a query (tuple) negatively to the tree.  The conjunction of
+            negative atoms is or'ed into the neg words of each branch.
+        """
+        query = list(query)
+        self.widen(query)
+        mask = word_mask(query, self.pos.shape[1])
+        if len(self.pos):
+            self.neg = self.neg | mask
+        else:
+            self.pos = np.zeros((1, len(mask)), dtype=np.uint64)
+            self.neg = mask[None, :]
+        self.drop_copies()
+
+    def drop_copies(self):
+        """ Prune, clean and absorb the rows just made, noting what was
+            dropped in last_update as the other trees do.
+        """
+        made = len(self.pos)
+        self.prune()
+        copies = len(self.pos)
+        self.clean()
+        self.last_update = (made, made - copies, copies - len(self.pos))
+        self.absorb()
+
+    def contr(self, branch):
+        """ Check if a (pos, neg) branch contains a logical contradiction,
+            i.e. a card that is both in and not in the hand.
+        """
+        pos, neg = branch
+        return pos & neg
+
+    def prune(self):
+        """ remove any branches with contradictions """
+        keep = ~(self.pos & self.neg).any(axis=1)
+        if not keep.all():
+            self.pos = self.pos[keep]
+            self.neg = self.neg[keep]
+
+    def clean(self):
+        """ Remove duplicate branches, keeping the first of each """
+        if len(self.pos) < 2:
+            return
+        rows = np.hstack([self.pos, self.neg])
+        _, first = np.unique(rows, axis=0, return_index=True)
+        if len(first) < len(rows):
+            first.sort()
+            self.pos = self.pos[first]
+            self.neg = self.neg[first]
+
+    def absorb(self, chunk=1 << 22):
+        """ Remove branches that are supersets of another branch, since
+            they are logically redundant.  Subsumption is transitive, so a
+            branch can go if any other branch is a subset of it, whether
+            or not that one stays.  As in bittree, the branches are grouped
+            by their lowest pos bit, and each group is only compared with
+            the branches that have that bit, a block at a time to keep the
+            comparison arrays to about chunk words.
+        """
+        n = len(self.pos)
+        if n < 2:
+            return
+        rows = np.hstack([self.pos, self.neg])
+        lowest = lowest_bits(self.pos)
+        subsumed = np.zeros(n, dtype=bool)
+        for low in np.unique(lowest):
+            subsets = np.flatnonzero(lowest == low)
+            if low < 0:
+                supersets = np.arange(n)
+            else:
+                word = np.uint64(1) << np.uint64(low % WORD)
+                supersets = np.flatnonzero(self.pos[:, low // WORD] & word)
+            if len(supersets) < 2:
+                continue
+            block = max(1, chunk // (len(supersets) * rows.shape[1]))
+            cand = rows[supersets]
+            for start in range(0, len(subsets), block):
+                part = subsets[start:start+block]
+                # contains[i, j] if row part[i] is a subset of row supersets[j]
+                outside = np.zeros((len(part), len(supersets)),
+                                   dtype=np.uint64)
+                for k in range(rows.shape[1]):
+                    outside |= rows[part, k][:, None] & ~cand[None, :, k]
+                contains = outside == 0
+                contains &= part[:, None] != supersets[None, :]
+                subsumed[supersets[contains.any(axis=0)]] = True
+        if subsumed.any():
+            self.pos = self.pos[~subsumed]
+            self.neg = self.neg[~subsumed]
+
+    @property
+    def branches(self):
+        """ the branches as (pos, neg) int bitmask pairs, as in bittree """
+        return [(to_int(p), to_int(n)) for p, n in zip(self.pos, self.neg)]
+
+    @branches.setter
+    def branches(self, branches):
+        width = max([max(p.bit_length(), n.bit_length())
+                     for p, n in branches] + [1]) // WORD + 1
+        self.pos = np.array([from_int(p, width) for p, n in branches],
+                            dtype=np.uint64).reshape(len(branches), width)
+        self.neg = np.array([from_int(n, width) for p, n in branches],
+                            dtype=np.uint64).reshape(len(branches), width)
+
+    def state(self):
+        """ the current version of the tree (see bittree.state) """
+        return self.pos, self.neg
+
+    def restore(self, state):
+        """ go back to a version returned by state """
+        self.pos, self.neg = state
+
+    #---------------------------
+    # Information about the tree
+    #---------------------------
+
+    def atoms(self, branch):
+        """ the set of atoms represented by a (pos, neg) branch """
+        pos, neg = branch
+        return set(atom(n, True) for n in nums(pos)) \
+                | set(atom(n, False) for n in nums(neg))
+
+    def print(self):
+        for b in self.branches:
+            print(sorted(list(self.atoms(b)), key=lambda a: a.num))
+
+    def common_masks(self):
+        """ get the (pos, neg) masks common to all branches """
+        if not len(self.pos): return 0, 0
+        return (to_int(np.bitwise_and.reduce(self.pos, axis=0)),
+                to_int(np.bitwise_and.reduce(self.neg, axis=0)))
+
+    def common_elements(self):
+        """ get a set of the atoms common to all branches """
+        return self.atoms(self.common_masks())
+
+    def possibles(self):
+        """ get a nested list representing the disjuctive part of the tree
+            bvals are not included since they will always be True
+            inner and outer lists are sorted in ascending order
+        """
+        if not len(self.pos): return []
+        cpos = np.bitwise_and.reduce(self.pos, axis=0)
+        cneg = np.bitwise_and.reduce(self.neg, axis=0)
+        diff = unpack(self.pos & ~cpos) | unpack(self.neg & ~cneg)
+        return sorted([np.flatnonzero(row).tolist()
+                       for row in diff[diff.any(axis=1)]])
+
+    def simple(self):
+        """ return a simple representation of the tree """
+        return sorted(list(self.common_elements()),
+                key=lambda a: a.num) + self.possibles() \
+                if len(self.pos) else []
+
+    def pos_elements(self):
+        """ the common atoms with bval True """
+        return set(nums(self.common_masks()[0]))
+
+    def neg_elements(self):
+        """ the common atoms with bval False """
+        return set(nums(self.common_masks()[1]))
+
+    def contains_any(self, nums):
+        """ compare the positive common atoms with the given enumerable
+            to see if any are included
+        """
+        pos = self.common_masks()[0]
+        return {n for n in nums if pos >> n & 1}
@@ -0,0 +1,243 @@
+""" What each opponent can have worked out, from what it has seen.
+
+    The players' trees hold what the CPU knows.  Each opponent (each
+    player other than the CPU) gets a view as well: a Player for every
+    hand, the CPU's included, updated only with what that opponent saw.
+    Every player sees who had none of the cards and who showed one; only
+    the suggester sees which card was shown.  An opponent knows its own
+    hand, but the CPU doesn't, so the opponent's own hand in its view is
+    only what the others can see of it, and a view can fall short of
+    what the opponent really knows.
+
+    With a view per opponent there are as many trees as players squared,
+    but most of them see the same things: an opponent's view of a hand
+    only differs from another's if one of them was shown a card from it.
+    The views' trees keep their branches in a BranchStore, which keeps
+    one list for equal branches and works out each update of a list
+    once, so equal trees are stored once and updated once.  Whenever the
+    store has doubled, the lists no view uses are dropped from it.
+"""
+from functools import partial
+from engine import Player, share_cards, deduce, definite_solution_nums
+from logic_tree import bittree, speculation
+
+class BranchStore:
+    """ Branch lists shared between bittrees.  Lists are never changed,
+        so an update of a given list by a given query always gives the
+        same list, which is remembered.  The lists no tree uses any more,
+        such as those of undone or speculative updates, are dropped by
+        collect.
+    """
+
+    def __init__(self):
+        self.empty = []
+        self.lists = {(): self.empty}
+        self.updates = {}
+        self.collected = len(self.lists)
+
+    def intern(self, branches):
+        """ the stored list equal to the branches """
+        return self.lists.setdefault(tuple(branches), branches)
+
+    def update(self, branches, bval, query):
+        """ The stored list for the stored branches after adding a
+            query.  Each update keeps the list it was made from, so its
+            id can't be reused while the update is remembered.
+        """
+        key = (id(branches), bval, tuple(query))
+        entry = self.updates.get(key)
+        if entry is None:
+            t = bittree()
+            t.branches = branches
+            if bval:
+                t.add_pos(query)
+            else:
+                t.add_neg(query)
+            entry = self.updates[key] = (branches, self.intern(t.branches))
+        return entry[1]
+
+    def collect(self, trees):
+        """ Drop the lists the trees don't use, and the updates from or
+            to them.  A tree holding a dropped list still works, but its
+            updates are no longer shared.
+        """
+        live = {id(self.empty): self.empty}
+        for t in trees:
+            live[id(t.branches)] = t.branches
+        self.lists = {tuple(b): b for b in live.values()}
+        self.updates = {key: entry for key, entry in self.updates.items()
+                        if id(entry[0]) in live and id(entry[1]) in live}
+        self.collected = len(self.lists)
+
+    def __len__(self):
+        return len(self.lists)
+
+class storedtree(bittree):
+    """ A bittree whose branch lists are kept in a BranchStore """
+
+    def __init__(self, store):
+        self.store = store
+        self.branches = store.empty
+
+    def add_pos(self, query):
+        self.branches = self.store.update(self.branches, True, query)
+
+    def add_neg(self, query):
+        self.branches = self.store.update(self.branches, False, query)
+
+class Observers:
+    """ The views of the opponents in a game, which follow the players
+        and suggestions as they are recorded.  A view is a list of hands
+        in turn order.  If solve is set, the solver is run over each view
+        after every suggestion, as it is for the players; otherwise the
+        cards found in one hand are only ruled out of the others.
+    """
+
+    def __init__(self, deck, solve=True, store=None):
+        self.deck = deck
+        self.solve = solve
+        self.store = store or BranchStore()
+        self.players = []
+        self.cpu = None
+        self.cpu_hand = set()
+        self.views = {}
+
+    def hand(self, name, ncards):
+        """ a new hand for a view """
+        return Player(name, ncards, False, deck=self.deck,
+                      tree=partial(storedtree, self.store))
+
+    def add_player(self, name, ncards, is_cpu=False, knowns=None):
+        """ Add a hand to every view, and a view of its own unless the
+            player is the CPU, whose knowns are its cards.  A view only
+            follows the suggestions made after it is added.
+        """
+        self.players.append((name, ncards))
+        for view in self.views.values():
+            view.append(self.hand(name, ncards))
+        if is_cpu:
+            self.cpu = name
+            self.cpu_hand = set(knowns)
+        else:
+            self.views[name] = [self.hand(n, nc) for n, nc in self.players]
+
+    def remove_player(self, name):
+        if name == self.cpu:
+            self.cpu = None
+            self.cpu_hand = set()
+        self.players = [p for p in self.players if p[0] != name]
+        self.views.pop(name, None)
+        for observer, view in self.views.items():
+            self.views[observer] = [p for p in view if p.name != name]
+
+    def apply(self, event):
+        """ follow an event, as in Game.apply """
+        if event['type'] == 'player':
+            self.add_player(event['name'], event['ncards'], event['is_cpu'],
+                            event['knowns'])
+        elif event['type'] == 'delete':
+            self.remove_player(event['name'])
+        elif event['type'] == 'suggestion':
+            self.record(event['suggester'], event['query'],
+                        event['responses'], event.get('shown'))
+
+    def record(self, suggester, query, responses, shown=None):
+        """ Update the views for a suggestion.  The suggester and the
+            responses are as in record_suggestion, with players given by
+            name or as Players.  shown is the card the CPU showed, if it
+            showed one and it is known; if not, the suggester is taken to
+            know only that it was one of the CPU's cards in the query.
+        """
+        suggester = getattr(suggester, 'name', suggester)
+        for observer, view in self.views.items():
+            hands = {p.name: p for p in view}
+            found = {}
+            for player, response in responses:
+                hand = hands[getattr(player, 'name', player)]
+                if response is None:
+                    pos = hand.update_for_no(query)
+                elif observer != suggester or hand.name != self.cpu:
+                    # either the observer didn't see the card, or the CPU
+                    # doesn't know which card the observer saw
+                    pos = hand.update_for_yes(query)
+                elif shown is not None:
+                    pos = hand.update_for_card(shown)
+                else:
+                    pos = hand.update_for_yes(sorted(set(query)
+                                                     & self.cpu_hand)
+                                              or query)
+                found[hand] = pos
+            share_cards(view, found)
+            if self.solve:
+                deduce(view)
+        self.tidy()
+
+    def tidy(self):
+        """ collect the store if it has doubled since it last was """
+        if len(self.store) > 2 * self.store.collected:
+            self.store.collect(p.hand for view in self.views.values()
+                               for p in view)
+
+    def leakage(self, observer, card):
+        """ How much showing one of the CPU's cards would tell the
+            observer: the number of (hand, card) cells of its view that
+            it would newly place, the envelope's included through the
+            solver.  The view is updated speculatively.
+        """
+        view = self.view(observer)
+        before = sum(len(p.pos) + len(p.neg) for p in view)
+        with speculation(*view):
+            hand = next(p for p in view if p.name == self.cpu)
+            share_cards(view, {hand: hand.update_for_card(card)})
+            if self.solve:
+                deduce(view)
+            leak = sum(len(p.pos) + len(p.neg) for p in view) - before
+        self.tidy()
+        return leak
+
+    def advise(self, suggester, cards):
+        """ Of the CPU's cards in a suggestion, the one to show the
+            suggester that tells it the least, and the leakage of each.
+            A card the suggester has already seen tells it nothing.
+        """
+        suggester = getattr(suggester, 'name', suggester)
+        leaks = {card: self.leakage(suggester, card) for card in cards}
+        return min(sorted(cards), key=leaks.get), leaks
+
+    def view(self, observer):
+        """ the hands as the observer sees them """
+        return self.views[getattr(observer, 'name', observer)]
+
+    def progress(self, observer):
+        """ How close an opponent is to solving the game: the envelope
+            cards it can be sure of, whether that is all of them, the
+            CPU's cards it knows, and the share of the cards in the
+            other hands it has placed.
+        """
+        view = self.view(observer)
+        observer = getattr(observer, 'name', observer)
+        solution = definite_solution_nums(view)
+        others = [p for p in view if p.name != observer]
+        placed = sum(len(p.pos) + len(p.neg) for p in others)
+        return {'solution': sorted(solution),
+                'solved': len(solution) == len(self.deck.categories),
+                'cpu_cards': sorted(p for h in others if h.name == self.cpu
+                                    for p in h.pos),
+                'placed': placed / max(1, len(others) * len(self.deck))}
+
+    def state(self):
+        """ the current version of the views (see Game.state) """
+        return (tuple(self.players), self.cpu, self.cpu_hand,
+                tuple((o, tuple((p, p.state()) for p in view))
+                      for o, view in self.views.items()))
+
+    def restore(self, state):
+        """ go back to a version returned by state """
+        players, self.cpu, self.cpu_hand, views = state
+        self.players = list(players)
+        self.views = {}
+        for o, view in views:
+            self.views[o] = [p for p, s in view]
+            for p, s in view:
+                p.restore(s)
+        self.tidy()
@@ -0,0 +1,204 @@
+import time
+from logic_tree import bittree, nums
+from solver import Solver
+
+def clauses(hand):
+    """ The positive clauses (card bitmasks) equivalent to a tree.
+        The branches of the tree are a disjunction of conjunctions, so the
+        clauses are the minimal sets of cards that meet every branch.
+        A tree that keeps its clauses is used as is, unless it has become
+        inconsistent, when it is left with no branches like the others.
+    """
+    if hasattr(hand, 'clauses'):
+        return list(hand.clauses) if hand.consistent else []
+    dual = bittree()
+    for alt in hand.possibles():
+        dual.add_pos(alt)
+    return [pos for pos, neg in dual.branches]
+
+class DealCounter:
+    """ Count the deals consistent with every player's tree and ncards,
+        and for each owner and card, the deals in which the owner holds
+        the card.  Owners are numbered as in Solver: the players and then
+        the envelope.
+
+        The cards are visited one at a time, and a state records what the
+        deal so far still requires: the number of cards each player has
+        left to receive, the categories whose envelope card is already
+        dealt, and which of the open clauses are satisfied.  A clause is
+        open from its first card until its last one, after which it must
+        be satisfied and is forgotten.  Deals that agree on the state are
+        counted together, so the work depends on the number of distinct
+        states rather than the number of deals.  A forward pass counts
+        the ways to reach each state and a backward pass the ways to
+        finish from it; their products give the counts for each card.
+
+        The number of states is what it costs.  On the classic deck with
+        six players it is usually under a second, but early in a game,
+        when little constrains the hands, it can take a few seconds.  If
+        a deadline (a time.perf_counter() time) is given, counting stops
+        there, complete is False and nothing is counted; sampler.estimate
+        gives an answer in a set time instead.
+    """
+
+    def __init__(self, players, categories, solver=None, deadline=None):
+        self.nowners = len(players) + 1
+        self.envelope = len(players)
+        self.total = 0
+        self.deadline = deadline
+        self.complete = True
+        self.counts = [[0] * sum(len(c) for c in categories)
+                       for _ in range(self.nowners)]
+        solver = solver or Solver(players, categories)
+        if solver.consistent():
+            self.count(players, categories, solver.can)
+
+    def late(self):
+        """ whether the deadline, if any, has passed, which stops the
+            counting for good """
+        if self.deadline is not None and time.perf_counter() > self.deadline:
+            self.complete = False
+            self.counts = [[0] * len(row) for row in self.counts]
+        return not self.complete
+
+    def order(self, ncards, player_clauses):
+        """ Choose the order to visit the cards in.  Each step greedily
+            takes the card that opens the fewest new clauses while closing
+            the most (closing counts double), so that few clauses are open
+            at any time.
+        """
+        allclauses = [c for pc in player_clauses for c in pc]
+        order = []
+        placed = 0
+        def cost(n):
+            card = 1 << n
+            touching = [c for c in allclauses if c & card]
+            opened = sum(1 for c in touching if not c & placed)
+            closed = sum(1 for c in touching if c & ~placed == card)
+            return opened - 2 * closed, n
+        remaining = set(range(ncards))
+        while remaining:
+            n = min(remaining, key=cost)
+            order.append(n)
+            placed |= 1 << n
+            remaining.remove(n)
+        return order
+
+    def count(self, players, categories, can):
+        ncards = len(self.counts[0])
+        category = {n: k for k, cat in enumerate(categories) for n in cat}
+        player_clauses = [[c & can[o] for c in clauses(p.hand)]
+                          for o, p in enumerate(players)]
+        order = self.order(ncards, player_clauses)
+        position = {n: i for i, n in enumerate(order)}
+
+        # bit numbers of the clauses containing each (owner, card),
+        # and the clause bits that close after each position
+        clause_bits = {}
+        closing = [0] * ncards
+        bit = 0
+        for o, pc in enumerate(player_clauses):
+            for c in pc:
+                for n in nums(c):
+                    clause_bits[o, n] = clause_bits.get((o, n), 0) | 1 << bit
+                closing[max(position[n] for n in nums(c))] |= 1 << bit
+                bit += 1
+        # categories whose last possible envelope card is at each position
+        envelope_closing = [0] * ncards
+        for k, cat in enumerate(categories):
+            last = max(position[n] for n in cat if can[self.envelope] >> n & 1)
+            envelope_closing[last] |= 1 << k
+        # the cards each player can still receive after each position
+        left = [[sum(1 for n in order[i+1:] if can[o] >> n & 1)
+                 for o in range(len(players))] for i in range(ncards)]
+
+        weight = []
+        w = 1
+        for p in players:
+            weight.append(w)
+            w *= p.ncards + 1
+        start = (sum(p.ncards * wt for p, wt in zip(players, weight)), 0, 0)
+        finish = (0, (1 << len(categories)) - 1, 0)
+
+        # the possible moves for the card at each position:
+        # (owner, weight, base, envelope bit, clause bits)
+        moves = []
+        for n in order:
+            moves.append([(o, weight[o], players[o].ncards + 1, 0,
+                           clause_bits.get((o, n), 0))
+                          if o != self.envelope else
+                          (o, 0, 1, 1 << category[n], 0)
+                          for o in range(self.nowners) if can[o] >> n & 1])
+        # only the players who could have had the card can fall short
+        checks = [[(wt, base, left[i][o]) for o, wt, base, k, b in m if wt]
+                  for i, m in enumerate(moves)]
+
+        def step(i, state, move):
+            """ the state after making the move for the card at position i,
+                or None if that leads to no consistent deal
+            """
+            code, env, sat = state
+            o, wt, base, k, bits = move
+            if wt:
+                if not code // wt % base:
+                    return None
+                code -= wt
+                sat |= bits
+            elif env & k:
+                return None
+            else:
+                env |= k
+            if sat & closing[i] != closing[i] or \
+               env & envelope_closing[i] != envelope_closing[i]:
+                return None
+            for wt, base, most in checks[i]:
+                if code // wt % base > most:
+                    return None
+            return code, env, sat & ~closing[i]
+
+        forward = [{start: 1}]
+        for i in range(ncards):
+            if self.late():
+                return
+            layer = {}
+            for state, ways in forward[-1].items():
+                for move in moves[i]:
+                    s = step(i, state, move)
+                    if s is not None:
+                        layer[s] = layer.get(s, 0) + ways
+            forward.append(layer)
+
+        backward = {finish: 1} if finish in forward[-1] else {}
+        for i in range(ncards - 1, -1, -1):
+            if self.late():
+                return
+            counts = [self.counts[move[0]] for move in moves[i]]
+            n = order[i]
+            layer = {}
+            for state, ways in forward[i].items():
+                total = 0
+                for move, row in zip(moves[i], counts):
+                    after = backward.get(step(i, state, move))
+                    if after:
+                        row[n] += ways * after
+                        total += after
+                if total:
+                    layer[state] = total
+            backward = layer
+        self.total = backward.get(start, 0)
+
+    #------------------------
+    # Results of the counting
+    #------------------------
+
+    def probability(self, owner, card):
+        """ the probability that the owner holds the card """
+        return self.counts[owner][card] / self.total if self.total else 0.0
+
+    def probabilities(self, owner):
+        """ the probability of each card being held by the owner """
+        return [self.probability(owner, n) for n in range(len(self.counts[0]))]
+
+    def solution_probabilities(self):
+        """ the probability of each card being in the envelope """
+        return self.probabilities(self.envelope)
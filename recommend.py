@@ -0,0 +1,91 @@
+""" Suggestion recommender based on expected information gain.
+
+    Requires numpy.
+"""
+import numpy as np
+from logic_tree import nums
+from sampler import sample_deals
+from solver import Solver
+
+def owner_matrix(solver, samples, seed=None):
+    """ sampled deals as an array of the owner of each card, one row
+        per deal """
+    deals = list(sample_deals(solver, samples, seed))
+    owners = np.zeros((len(deals), len(nums(solver.allcards))), dtype=np.int8)
+    for d, deal in enumerate(deals):
+        for o, hand in enumerate(deal):
+            owners[d, nums(hand)] = o
+    return owners
+
+def information_gain(owners, nowners, categories, order, sees_card=True):
+    """ Score every suggestion of one card from each category.
+
+        owners - sampled deals from owner_matrix
+        nowners - the number of owners, counting the envelope
+        order - the owners who respond, in turn; all other owners
+            (the suggester and the envelope) never show a card
+        sees_card - whether the suggester sees which card is shown
+
+        The outcome of a suggestion is the responder who shows a card (or
+        none) and, if the suggester sees it, the card.  A responder with
+        several of the cards is taken to show any one of them with equal
+        chance.  The information gained about the deal is the entropy of
+        the outcome less the entropy of the responder's choice.
+        Returns an array of bits with an axis per category, indexed by
+        the cards' positions within their categories.
+    """
+    ndeals = len(owners)
+    nobody = len(order)
+    rank = np.full(nowners, nobody)
+    rank[list(order)] = np.arange(len(order))
+    ranks = rank[owners]
+    ncats = len(categories)
+    by_cat = []
+    for k, cat in enumerate(categories):
+        shape = [ndeals] + [1] * ncats
+        shape[k + 1] = len(cat)
+        by_cat.append(ranks[:, list(cat)].reshape(shape))
+    first = by_cat[0]
+    for r in by_cat[1:]:
+        first = np.minimum(first, r)
+    held = [r == first for r in by_cat]
+    shown = sum(h.astype(float) for h in held)
+    answered = first < nobody
+
+    gain = np.zeros(first.shape[1:])
+    p_none = (~answered).sum(axis=0) / ndeals
+    gain -= np.where(p_none > 0, p_none * np.log2(np.where(p_none > 0,
+                                                            p_none, 1)), 0)
+    choice = np.where(answered, 1.0 / shown, 0.0)
+    for r in range(len(order)):
+        by_r = answered & (first == r)
+        if sees_card:
+            parts = [(by_r & h) * choice for h in held]
+        else:
+            parts = [by_r.astype(float)]
+        for part in parts:
+            p = part.sum(axis=0) / ndeals
+            gain -= np.where(p > 0, p * np.log2(np.where(p > 0, p, 1)), 0)
+    if sees_card:
+        # the responder's own choice carries no information about the deal
+        gain -= np.where(answered, np.log2(shown), 0).sum(axis=0) / ndeals
+    return gain
+
+def recommend(players, categories, suggester, top=5, samples=300, seed=None):
+    """ The top suggestions for the suggester (an index into players)
+        as (bits, cards) pairs, cards being indices into the deck, one
+        from each category
+    """
+    solver = Solver(players, categories)
+    if not solver.consistent():
+        return []
+    owners = owner_matrix(solver, samples, seed)
+    n = len(players)
+    order = [(suggester + i) % n for i in range(1, n)]
+    gain = information_gain(owners, n + 1, categories, order,
+                            players[suggester].is_cpu)
+    best = np.argsort(gain, axis=None)[::-1][:top]
+    cats = [list(c) for c in categories]
+    return [(float(gain.flat[i]),
+             [cats[k][j] for k, j in enumerate(np.unravel_index(i, gain.shape))])
+            for i in best]
@@ -0,0 +1,193 @@
+import math
+import time
+from concurrent.futures import ProcessPoolExecutor
+from os import cpu_count
+from random import Random
+from logic_tree import bittree, nums
+from solver import Solver
+
+class Chain:
+    """ A Markov chain over the deals consistent with a solver's
+        constraints.  A deal is a list of card bitmasks, one per owner.
+        Each step proposes passing two or three cards around between
+        their owners, and makes the move if all the hands still satisfy
+        their constraints.  The proposals are symmetric, so every
+        reachable deal is equally likely in the long run.  The chain
+        starts from a deal found by a randomized search, which is not
+        uniform, so the first burn_in steps are discarded.  If the
+        solver has a deadline that passes before the burn-in is done,
+        the chain gives no deals.
+    """
+
+    def __init__(self, solver, rng, burn_in=None):
+        self.solver = solver
+        self.rng = rng
+        self.cards = nums(solver.allcards)
+        self.owners = [o for o, n in enumerate(solver.ncards) if n] \
+                      + [solver.envelope]
+        self.clauses = []
+        for alts in solver.alternatives:
+            dual = bittree()
+            for a in alts:
+                dual.add_pos(nums(a))
+            self.clauses.append([pos for pos, neg in dual.branches])
+        self.burn_in = 50 * len(self.cards) if burn_in is None else burn_in
+        self.deal = None
+
+    def start(self):
+        """ start from a deal found by a randomized search """
+        self.solver.nodes = self.solver.limit
+        self.deal = self.solver.search(list(self.solver.can), self.rng) or None
+        if self.deal:
+            self.held = [nums(hand) for hand in self.deal]
+            for i in range(self.burn_in):
+                if i % 100 == 0 and self.solver.late():
+                    self.deal = None
+                    return
+                self.step()
+
+    def allowed(self, o, hand):
+        """ check a hand against the owner's constraints """
+        if hand & ~self.solver.can[o]:
+            return False
+        if o == self.solver.envelope:
+            return all(bin(hand & cat).count('1') == 1
+                       for cat in self.solver.categories)
+        return all(c & hand for c in self.clauses[o])
+
+    def step(self):
+        """ Propose taking a random card from each of two or three random
+            owners and passing each one on to the next owner, and do it if
+            it is allowed.  Hand sizes never change, and the move that
+            undoes it picks the same owners in another order, so the
+            proposals are symmetric.
+        """
+        rand = self.rng.random
+        owners = self.rng.sample(self.owners, 2 if rand() < 0.5 else 3)
+        picks = [int(rand() * len(self.held[o])) for o in owners]
+        cards = [self.held[o][i] for o, i in zip(owners, picks)]
+        hands = []
+        for i, n in enumerate(cards):
+            o = owners[i-1]
+            hand = self.deal[o] ^ (1 << cards[i-1]) ^ (1 << n)
+            if not self.allowed(o, hand):
+                return
+            hands.append(hand)
+        for i, n in enumerate(cards):
+            o = owners[i-1]
+            self.deal[o] = hands[i]
+            self.held[o][picks[i-1]] = n
+
+    def sample(self, thin=None):
+        """ the next sampled deal, or None if there is no deal """
+        if self.deal is None:
+            self.start()
+            if self.deal is None:
+                return None
+        for _ in range(thin or 2 * len(self.cards)):
+            self.step()
+        return list(self.deal)
+
+def sample_deals(solver, n, seed=None):
+    """ generate up to n deals consistent with the solver's constraints """
+    chain = Chain(solver, Random(seed))
+    for _ in range(n):
+        deal = chain.sample()
+        if deal is None:
+            return
+        yield deal
+
+def _sample(solver, seed, n, deadline):
+    """ Worker for estimate: count the sampled owners of each card.
+        Stops early at the deadline or on an interrupt, and returns
+        what it has so far.
+    """
+    counts = [[0] * len(nums(solver.allcards)) for _ in solver.can]
+    done = 0
+    try:
+        for deal in sample_deals(solver, n, seed):
+            for o, hand in enumerate(deal):
+                for c in nums(hand):
+                    counts[o][c] += 1
+            done += 1
+            if deadline and time.time() > deadline:
+                break
+    except KeyboardInterrupt:
+        pass
+    return done, counts
+
+def wilson(p, n, z=1.96):
+    """ the Wilson score interval for a proportion p of n samples """
+    if not n:
+        return 0.0, 1.0
+    z2 = z * z
+    center = (p + z2 / (2*n)) / (1 + z2/n)
+    half = z * math.sqrt(p*(1-p)/n + z2/(4*n*n)) / (1 + z2/n)
+    return max(0.0, center - half), min(1.0, center + half)
+
+class Estimate:
+    """ Sampled probabilities of each owner holding each card, with the
+        Wilson score interval for each.  Samples from a Markov chain are
+        not independent, so the intervals are only a guide.  complete
+        is False if the sampling was cut short.
+    """
+
+    def __init__(self, samples, counts, complete, z=1.96):
+        self.samples = samples
+        self.counts = counts
+        self.complete = complete
+        self.z = z
+
+    def probability(self, owner, card):
+        if not self.samples:
+            return 0.0
+        return self.counts[owner][card] / self.samples
+
+    def interval(self, owner, card):
+        """ the confidence interval for the probability """
+        return wilson(self.probability(owner, card), self.samples, self.z)
+
+    def solution_probabilities(self):
+        """ (probability, low, high) of each card being in the envelope """
+        envelope = len(self.counts) - 1
+        return [(self.probability(envelope, n),) + self.interval(envelope, n)
+                for n in range(len(self.counts[envelope]))]
+
+def estimate(players, categories, samples=10000, seconds=None,
+             workers=None, seed=0):
+    """ Estimate where the cards are by sampling consistent deals.
+        The samples are split over a pool of worker processes, each with
+        its own seed.  Sampling stops after the given number of samples
+        or seconds, whichever comes first, and an interrupt returns the
+        results gathered so far.
+    """
+    solver = Solver(players, categories)
+    workers = workers or cpu_count() or 1
+    counts = [[0] * len(nums(solver.allcards)) for _ in range(len(players)+1)]
+    total = 0
+    if not solver.consistent():
+        return Estimate(total, counts, True)
+    deadline = time.time() + seconds if seconds else None
+    shares = [samples // workers + (i < samples % workers)
+              for i in range(workers)]
+    complete = True
+    with ProcessPoolExecutor(workers) as pool:
+        futures = [pool.submit(_sample, solver, seed + i, n, deadline)
+                   for i, n in enumerate(shares) if n]
+        results = []
+        try:
+            for f in futures:
+                results.append(f.result())
+        except KeyboardInterrupt:
+            complete = False
+            for f in futures[len(results):]:
+                try:
+                    results.append(f.result(timeout=1))
+                except Exception:
+                    pass
+    for done, c in results:
+        total += done
+        for row, crow in zip(counts, c):
+            for n, k in enumerate(crow):
+                row[n] += k
+    return Estimate(total, counts, complete and total == samples)
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+""" Play many random games with the solver and collect statistics.
+
+    Each game is dealt from its own seed, so any game can be replayed.
+    The results are streamed to a JSONL file, one line per game, as the
+    games finish.  Seeds already in the file are skipped, so an
+    interrupted run can be resumed by running it again.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from random import Random
+from engine import Player, play, random_game, indices_to_all
+
+def run_game(seed, ncards=(3, 4, 3, 4, 4), cpu=True):
+    """ Play one random game and return its statistics as a dict """
+    rng = Random(seed)
+    dealt = [Player('P{}'.format(i+1), n, False) for i, n in enumerate(ncards)]
+    test_data = random_game(dealt, rng)
+    true_hands = test_data[0]
+    players = [Player(p.name, p.ncards, cpu and i == 0,
+                      true_hands[0] if cpu and i == 0 else None)
+               for i, p in enumerate(dealt)]
+    peaks = [0] * len(players)
+
+    def track(i, suggester, query, responses):
+        for k, p in enumerate(players):
+            peaks[k] = max(peaks[k], len(p.hand.branches))
+
+    start = time.time()
+    true_solution, computed, made = play(players, test_data, track)
+    return {
+        'seed': seed,
+        'ncards': list(ncards),
+        'solved': set(computed) == set(indices_to_all(true_solution)),
+        'suggestions': len(made),
+        'seconds': time.time() - start,
+        'peak_branches': peaks,
+    }
+
+def done_seeds(path):
+    """ the seeds already in a results file """
+    if not os.path.exists(path):
+        return set()
+    with open(path) as f:
+        return {json.loads(line)['seed'] for line in f if line.strip()}
+
+def simulate(path, games, seed=0, ncards=(3, 4, 3, 4, 4), cpu=True,
+             workers=None):
+    """ Play the games for seeds seed..seed+games-1 that are not in the
+        results file yet, appending each result as it finishes
+    """
+    todo = [s for s in range(seed, seed + games) if s not in done_seeds(path)]
+    with open(path, 'a') as out, ProcessPoolExecutor(workers) as pool:
+        futures = [pool.submit(run_game, s, ncards, cpu) for s in todo]
+        for f in as_completed(futures):
+            out.write(json.dumps(f.result()) + '\n')
+            out.flush()
+
+def summarize(path):
+    """ aggregate the results in a file """
+    with open(path) as f:
+        results = [json.loads(line) for line in f if line.strip()]
+    if not results:
+        return {'games': 0}
+    solved = [r for r in results if r['solved']]
+    seconds = sorted(r['seconds'] for r in results)
+    return {
+        'games': len(results),
+        'solve_rate': len(solved) / len(results),
+        'suggestions': dict(sorted(Counter(r['suggestions']
+                                           for r in solved).items())),
+        'mean_suggestions': sum(r['suggestions'] for r in solved)
+                            / len(solved) if solved else None,
+        'mean_seconds': sum(seconds) / len(seconds),
+        'max_seconds': seconds[-1],
+        'peak_branches': max(max(r['peak_branches']) for r in results),
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('games', type=int, help='number of games to play')
+    parser.add_argument('-o', '--out', default='simulate.jsonl',
+                        help='JSONL results file, appended to')
+    parser.add_argument('-s', '--seed', type=int, default=0,
+                        help='seed of the first game')
+    parser.add_argument('-n', '--ncards', default='3,4,3,4,4',
+                        help='cards held by each player, in turn order')
+    parser.add_argument('--no-cpu', action='store_true',
+                        help='do not make the first player the CPU')
+    parser.add_argument('-w', '--workers', type=int, default=None,
+                        help='worker processes (default: all cores)')
+    args = parser.parse_args(argv)
+    ncards = tuple(int(n) for n in args.ncards.split(','))
+    simulate(args.out, args.games, args.seed, ncards, not args.no_cpu,
+             args.workers)
+    json.dump(summarize(args.out), sys.stdout, indent=2)
+    print()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,268 @@
+import time
+from logic_tree import bits, nums
+
+try:
+    count = int.bit_count
+except AttributeError:      # before python 3.10
+    def count(mask):
+        return bin(mask).count('1')
+
+class Solver:
+    """ A constraint solver that reasons over every hand at once.
+
+        The state is a list of bitmasks over the cards, one per owner,
+        where owners 0..n-1 are the players and owner n is the envelope.
+        A card is in an owner's mask as long as that owner may still hold
+        it.  The constraints are:
+            - every card is held by exactly one owner
+            - each player holds exactly ncards cards
+            - the envelope holds exactly one card of each category
+            - each player's hand satisfies the player's logic tree
+        Propagation alone is not complete, so it is embedded in a small
+        DPLL style search which is used to test each remaining
+        (owner, card) pair for consistency.  Each test gives up after
+        limit search nodes, in which case the pair is kept, so the
+        results are always sound if not always complete.  For the same
+        reason the tests can stop at a deadline (a time.perf_counter()
+        time), after which every search gives up at once.
+    """
+
+    def __init__(self, players, categories, limit=2000, deadline=None):
+        self.limit = limit
+        self.deadline = deadline
+        self.categories = [bits(c) for c in categories]
+        self.allcards = 0
+        for cat in self.categories:
+            self.allcards |= cat
+        self.ncards = [p.ncards for p in players]
+        self.envelope = len(players)
+        self.alternatives = []
+        can = []
+        for p in players:
+            neg = bits(p.hand.neg_elements())
+            pos = bits(p.hand.pos_elements())
+            can.append(self.allcards & ~neg)
+            self.alternatives.append([bits(a) | pos
+                                      for a in p.hand.possibles()] or [pos])
+        can.append(self.allcards)
+        self.can = self.propagate(can)
+        if self.can is not None:
+            self.refine()
+
+    def late(self):
+        """ whether the deadline, if any, has passed """
+        return self.deadline is not None and time.perf_counter() > self.deadline
+
+    def others(self, can):
+        """ for each owner, the cards some other owner may hold """
+        before = [0]
+        for c in can[:-1]:
+            before.append(before[-1] | c)
+        result = [0] * len(can)
+        after = 0
+        for o in range(len(can) - 1, -1, -1):
+            result[o] = before[o] | after
+            after |= can[o]
+        return result
+
+    def propagate(self, can):
+        """ Apply the constraints until nothing changes.
+            Returns the reduced masks or None if they are inconsistent.
+        """
+        return self.reduce(can, self.alternatives)[0]
+
+    def reduce(self, can, alternatives):
+        """ Propagate the constraints, given each player's alternatives
+            that are still viable.  Returns the reduced masks and the
+            alternatives that remain viable, or (None, None).  Masks only
+            shrink below a node of the search, so the search hands each
+            node's alternatives on to its children rather than filtering
+            all of them again.
+        """
+        can = list(can)
+        alternatives = list(alternatives)
+        changed = True
+        while changed:
+            changed = False
+            union = 0
+            for c in can:
+                union |= c
+            if union != self.allcards:
+                return None, None
+            others = self.others(can)
+            limits = [(o, self.allcards, n)
+                      for o, n in enumerate(self.ncards)] \
+                   + [(self.envelope, cat, 1) for cat in self.categories]
+            for o, cat, need in limits:
+                possible = can[o] & cat
+                fixed = possible & ~others[o]
+                if count(fixed) > need or count(possible) < need:
+                    return None, None
+                if count(fixed) == need and possible != fixed:
+                    can[o] &= ~(possible & ~fixed)
+                    changed = True
+                elif count(possible) == need and fixed != possible:
+                    for o1 in range(len(can)):
+                        if o1 != o:
+                            can[o1] &= ~possible
+                    changed = True
+                if changed:
+                    break
+            if changed:
+                continue
+            for o, alts in enumerate(alternatives):
+                fixed = can[o] & ~others[o]
+                viable = [a for a in alts if not a & ~can[o]
+                          and count(a | fixed) <= self.ncards[o]]
+                if not viable:
+                    return None, None
+                alternatives[o] = viable
+                common = viable[0]
+                for a in viable:
+                    common &= a
+                if common & others[o]:
+                    for o1 in range(len(can)):
+                        if o1 != o:
+                            can[o1] &= ~common
+                    changed = True
+                    break
+        return can, alternatives
+
+    def search(self, can, rng=None, prefer=None, alternatives=None):
+        """ find one complete, consistent deal below the given masks
+            returns the list of masks of the deal, None if there is none,
+            or False if the search ran out of nodes.  If a random number
+            generator is given, the owners are tried in random order.
+            If prefer is given, a list of masks, the owners whose mask
+            has the card are tried first.  alternatives are the viable
+            alternatives, from reduce.
+        """
+        self.nodes -= 1
+        if self.nodes < 0 or self.late():
+            return False
+        can, alternatives = self.reduce(can,
+                                        alternatives or self.alternatives)
+        if can is None:
+            return None
+        others = self.others(can)
+        undecided = 0
+        for o, c in enumerate(can):
+            undecided |= c & others[o]
+        if not undecided:
+            return can
+        if prefer:
+            deal = self.greedy(can, prefer, alternatives)
+            if deal:
+                return deal
+        card = undecided & -undecided
+        owners = [o for o, c in enumerate(can) if c & card]
+        if rng:
+            rng.shuffle(owners)
+        if prefer:
+            owners.sort(key=lambda o: not prefer[o] & card)
+        result = None
+        for o in owners:
+            trial = [c1 & ~card if o1 != o else c1
+                     for o1, c1 in enumerate(can)]
+            deal = self.search(trial, rng, prefer, alternatives)
+            if deal:
+                return deal
+            if deal is False:
+                result = False
+        return result
+
+    def greedy(self, can, prefer, alternatives):
+        """ Try to complete the masks to a deal in one pass, without any
+            search.  The envelope gets a card of each category and each
+            player one of its alternatives, the preferred cards first,
+            and the other cards go to the players with the most room.
+            Returns the deal, or None if that does not satisfy the
+            constraints.  When the constraints are loose, which is when
+            the search would be deepest, this usually finds a deal.
+        """
+        others = self.others(can)
+        deal = [c & ~others[o] for o, c in enumerate(can)]
+        taken = 0
+        for d in deal:
+            taken |= d
+        def give(o, cards):
+            nonlocal taken
+            deal[o] |= cards
+            taken |= cards
+        for cat in self.categories:
+            if not deal[self.envelope] & cat:
+                free = can[self.envelope] & cat & ~taken
+                if not free:
+                    return None
+                pick = free & prefer[self.envelope] or free
+                give(self.envelope, pick & -pick)
+        for o, alts in enumerate(alternatives):
+            if any(not a & ~deal[o] for a in alts):
+                continue
+            viable = [a for a in alts if not a & ~can[o]
+                      and not a & taken & ~deal[o]
+                      and count(a | deal[o]) <= self.ncards[o]]
+            if not viable:
+                return None
+            give(o, max(viable, key=lambda a: count(a & prefer[o])))
+        room = [n - count(d) for n, d in zip(self.ncards, deal)]
+        for n in nums(self.allcards & ~taken):
+            card = 1 << n
+            best = None
+            for o, r in enumerate(room):
+                if r > 0 and can[o] & card:
+                    key = (bool(prefer[o] & card), r)
+                    if best is None or key > best[0]:
+                        best = key, o
+            if best is None:
+                return None
+            give(best[1], card)
+            room[best[1]] -= 1
+        if any(room):
+            return None
+        return deal
+
+    def refine(self):
+        """ Remove every (owner, card) pair that is not part of any
+            consistent deal.  Each deal that is found is a witness for
+            all of its pairs, so they need not be tested again, and the
+            search steers towards deals with as many untested pairs as
+            it can.  The envelope's pairs are tested first, as they
+            matter most if the deadline cuts the tests short.
+        """
+        untested = list(self.can)
+        order = [self.envelope] + list(range(self.envelope))
+        while self.can is not None and any(untested) and not self.late():
+            o = next(o for o in order if untested[o])
+            card = untested[o] & -untested[o]
+            trial = [c & ~card if o1 != o else c
+                     for o1, c in enumerate(self.can)]
+            self.nodes = self.limit
+            deal = self.search(trial, prefer=untested)
+            if deal is None:
+                self.can[o] &= ~card
+                self.can = self.propagate(self.can)
+                if self.can is not None:
+                    untested = [u & c for u, c in zip(untested, self.can)]
+            elif deal:
+                untested = [u & ~d for u, d in zip(untested, deal)]
+            untested[o] &= ~card
+
+    #---------------------
+    # Results of the solve
+    #---------------------
+
+    def consistent(self):
+        return self.can is not None
+
+    def possible(self, owner):
+        """ the cards the owner may hold in some consistent deal """
+        return set(nums(self.can[owner]))
+
+    def known(self, owner):
+        """ the cards the owner holds in every consistent deal """
+        return set(nums(self.can[owner] & ~self.others(self.can)[owner]))
+
+    def solution_nums(self):
+        """ the cards known to be in the envelope """
+        return self.known(self.envelope)
@@ -0,0 +1,46 @@
+import time
+from random import Random
+from engine import *
+from deck import custom_deck
+from accuse import accuse
+
+def test_certain():
+    game = Game()
+    game.add_player('Dow', 3, True, [0, 12, 19])
+    for name, ncards in [('Tave', 4), ('Osanna', 3), ('Lucinda', 4),
+                         ('Nathan', 4)]:
+        game.add_player(name, ncards)
+    game.suggest('Dow', [4, 10, 18], [('Tave', None), ('Osanna', None),
+                                      ('Lucinda', None), ('Nathan', None)])
+    accusation = game.accuse(budget=0)
+    assert accusation.cards == [4, 10, 18]
+    assert accusation.certain and accusation.stage == 'solver'
+
+def test_budget_and_confidence():
+    players = [Player('P{}'.format(i+1), 3, False) for i in range(6)]
+    hands, solution, made = random_game(players, Random(4))
+    play(players, (hands, solution, made[:14]))
+
+    accusation = accuse(players, budget=0)
+    assert accusation.stage == 'solver' and len(accusation.cards) == 3
+    assert not accusation.confident(0.5)
+
+    accusation = accuse(players, budget=10, confidence=0.0, seed=1)
+    assert accusation.stage == 'sampled' and accusation.samples == 20
+
+    accusation = accuse(players, budget=10, confidence=0.0, seed=1,
+                        check_every=200)
+    assert accusation.stage == 'sampled'
+    assert 0 < accusation.low <= accusation.probability \
+           <= accusation.high < 1
+
+def test_large_deck_keeps_to_budget():
+    deck = custom_deck([50] * 4)
+    players = [Player('P{}'.format(i+1), 49, False, deck=deck)
+               for i in range(4)]
+    hands, solution, made = random_game(players, Random(4))
+    play(players, (hands, solution, made[:10]))
+    start = time.perf_counter()
+    accusation = accuse(players, budget=0)
+    assert time.perf_counter() - start < 0.5
+    assert accusation.stage == 'solver' and len(accusation.cards) == 4
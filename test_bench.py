@@ -0,0 +1,20 @@
+import json
+from bench import *
+from logic_tree import tree, bittree
+
+def test_grow():
+    assert grow_disjoint(tree, 4) == (4, 81)
+    assert grow_disjoint(bittree, 4) == (4, 81)
+
+def test_games():
+    ops, peak = games(bittree, ngames=1)
+    assert ops > 0 and peak > 0
+
+def test_suite():
+    lines = []
+    results = run_suite(bittree, ['grow-disjoint'], out=lines.append)
+    r = results['results']['grow-disjoint']
+    assert r['peak_branches'] == 3**7 and r['peak_kib'] > 0
+    again = json.loads(json.dumps(results))
+    compare(results, again, out=lines.append)
+    assert '1.00x' in lines[-1]
@@ -34,3 +34,31 @@ def test_solve2():
             automate(players, test_data=(true_hands, true_solution, suggestions))
 
     assert computed_solution == true_solution
+
+def test_knowledge_matrix():
+    players = [ Player('Dow', 3, True, [0, 12, 19]),
+                Player('Tave', 4, False) ]
+    players[1].update_for_no([1, 7, 13])
+    players[1].update_for_yes([2, 8, 14])
+
+    assert players[1].update_for_card(2) == {2}
+    matrix = knowledge_matrix(players)
+    assert matrix[0][0] == HAS and matrix[0][1] == HAS_NOT
+    assert matrix[1][2] == HAS and matrix[1][7] == HAS_NOT
+    assert matrix[1][3] == UNKNOWN
+    assert players[1].has_any([2, 7]) and not players[1].has_any([7, 8])
+
+def test_solution_probabilities():
+    players = [ Player('Dow', 3, True, [0, 12, 19]),
+                Player('Tave', 4, False),
+                Player('Osanna', 3, False),
+                Player('Lucinda', 4, False),
+                Player('Nathan', 4, False) ]
+    for p in players[1:]:
+        p.update_for_no([1, 7, 13])
+    probs = dict(solution_probabilities(players))
+
+    assert probs['Mr. Green'] == probs['candlestick'] == \
+           probs['conservatory'] == 1.0
+    assert 'Colonel Mustard' not in probs
+    assert abs(sum(probs.values()) - 3) < 1e-9
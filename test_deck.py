@@ -0,0 +1,33 @@
+from random import Random
+from deck import *
+from engine import Game, Player, play
+
+def test_classic():
+    assert len(CLASSIC) == 21
+    assert CLASSIC.indices_to_all((1, 2, 3)) == [1, 8, 15]
+    assert len(MASTER_DETECTIVE) == 30
+
+def test_custom():
+    deck = custom_deck([2, 3, 2, 4], ['Who', 'What', 'Where', 'When'])
+    assert deck.cards[:3] == ['1.1', '1.2', '2.1']
+    assert custom_deck([2, 1], ['Suspects', 'Rooms']).cards == \
+           ['S1', 'S2', 'R1']
+    assert [len(c) for c in deck.categories] == [2, 3, 2, 4]
+    assert deck.indices_to_all((1, 0, 1, 3)) == [1, 2, 6, 10]
+    assert Deck.from_json(deck.to_json()) == deck
+
+def test_play_four_categories():
+    deck = custom_deck([4, 4, 5, 5])
+    players = [Player('P{}'.format(i+1), n, False, deck=deck)
+               for i, n in enumerate([5, 5, 4])]
+    true_solution, computed, made = play(players, rng=Random(3))
+    assert len(computed) == 4
+    assert computed == set(deck.indices_to_all(true_solution))
+
+def test_game_deck():
+    game = Game(deck=MASTER_DETECTIVE)
+    game.add_player('Dow', 9, True, list(range(9)))
+    game.add_player('Tave', 9)
+    game.add_player('Osanna', 9)
+    assert len(game.players[1].known) == 30
+    assert game.hand('Dow')[0] == set(range(9))
@@ -0,0 +1,115 @@
+import subprocess
+import sys
+from engine import *
+
+def test_no_menu_import():
+    code = "import engine, sys; assert 'menu' not in sys.modules"
+    subprocess.run([sys.executable, '-c', code], check=True)
+
+def test_game():
+    game = Game()
+    game.add_player('Dow', 3, True, [0, 12, 19])
+    for name, ncards in [('Tave', 4), ('Osanna', 3), ('Lucinda', 4),
+                         ('Nathan', 4)]:
+        game.add_player(name, ncards)
+    game.suggest('Dow', [4, 10, 18], [('Tave', None), ('Osanna', None),
+                                      ('Lucinda', None), ('Nathan', None)])
+
+    assert game.definite_solution_nums() == {4, 10, 18}
+    assert game.found_solution()
+    assert 4 in game.hand('Tave')[1]
+
+def test_play_headless():
+    players = [ Player('Dow', 3, True,[0, 12, 19]), 
+                Player('Tave', 4, False), 
+                Player('Osanna', 3, False), 
+                Player('Lucinda', 4, False),
+                Player('Nathan', 4, False) ]
+    true_hands = [set([0,12,19]), set([2,6,8,20]), set([3,11,17]), set([1,9,13,14]), set([5,7,15,16])]
+    suggestions = [(0,(1,1,1)), (1,(2,2,2)), (2,(3,4,5)), (3,(3,5,2)), (4,(4,4,6)), (0,(4,4,6))]
+    seen = []
+    true_solution, computed, made = \
+            play(players, (true_hands, (4,4,6), suggestions),
+                 lambda i, suggester, query, responses: seen.append(responses))
+
+    assert computed == set(indices_to_all(true_solution))
+    assert len(made) == len(seen) == 6
+    assert seen[0] == [(players[1], None), (players[2], None), (players[3], 1)]
+
+def test_undo_redo_rewind():
+    game = Game()
+    game.add_player('Dow', 3, True, [0, 12, 19])
+    for name, ncards in [('Tave', 4), ('Osanna', 3), ('Lucinda', 4),
+                         ('Nathan', 4)]:
+        game.add_player(name, ncards)
+    game.suggest('Tave', [1, 7, 13], [('Osanna', None), ('Lucinda', True)])
+    after_one = [(p.name, set(p.pos), set(p.neg), p.hand.branches)
+                 for p in game.players]
+    game.suggest('Dow', [3, 9, 15], [('Tave', 9)])
+    game.suggest('Osanna', [2, 8, 14], [('Lucinda', None), ('Nathan', 8)])
+
+    # a mistyped response is undone and entered again
+    assert game.undo()
+    game.suggest('Osanna', [2, 8, 14], [('Lucinda', None), ('Nathan', 14)])
+    assert 14 in game.hand('Nathan')[0] and 8 not in game.hand('Nathan')[0]
+    assert not game.redo()
+
+    assert game.rewind(1)
+    assert [(p.name, set(p.pos), set(p.neg), p.hand.branches)
+            for p in game.players] == after_one
+    assert game.redo()
+    assert 9 in game.hand('Tave')[0]
+    assert not game.rewind(4)
+
+    # versions share the trees of players that did not change
+    shared = 0
+    for (_, a), (_, b) in zip(game.history, game.history[1:]):
+        for (p, s), (q, t) in zip(a, b):
+            if s[0] == t[0]:
+                assert s[0] is t[0]
+                shared += 1
+    assert shared
+
+    assert game.rewind(0)
+    game.undo()
+    assert [p.name for p in game.players] == ['Dow', 'Tave', 'Osanna',
+                                              'Lucinda']
+
+def test_share_cards():
+    a, b, c = players = [Player(name, 6, False) for name in 'ABC']
+    b.update_for_yes([0, 1])
+    c.update_for_yes([1, 2])
+    shared = share_cards(players, {a: a.update_for_card(0)})
+    assert shared == {a: {0}, b: {1}, c: {2}}
+    assert a.neg == {1, 2} and b.neg == {0, 2} and c.neg == {0, 1}
+    assert share_cards(players, {a: set()}) == {}
+
+def test_speculate():
+    game = Game()
+    game.add_player('Dow', 3, True, [0, 12, 19])
+    game.add_player('Tave', 4)
+    game.add_player('Osanna', 3)
+    tave = game.player('Tave')
+    tave.update_for_yes([1, 7])
+    before = tave.state()
+    with tave.speculate():
+        tave.update_for_no([1])
+        assert tave.known[7] == HAS
+    assert tave.known[7] == UNKNOWN and tave.known[1] == UNKNOWN
+    assert tave.state() == before
+
+    with game.speculate():
+        game.suggest('Osanna', [2, 8, 14], [('Dow', None), ('Tave', None)])
+        assert 8 in game.hand('Tave')[1]
+    assert 8 not in game.hand('Tave')[1]
+    assert len(game.history) == 4 and not game.redo()
+
+def test_deduce_within_budget():
+    deck = custom_deck([30] * 4)
+    players = [Player('P{}'.format(i+1), 29, False, deck=deck)
+               for i in range(4)]
+    hands, solution, made = random_game(players, random.Random(2))
+    play(players, (hands, solution, made[:8]))
+    for p, hand in zip(players, hands):
+        assert p.pos <= set(hand) and not p.neg & set(hand)
+    assert deduce(players, seconds=0).consistent()
@@ -0,0 +1,121 @@
+import json
+from engine import *
+from eventlog import EventLog
+
+def new_game(log=None):
+    """ a game with five players, logged from the start if a log is
+        given """
+    game = Game()
+    if log:
+        log.start(game)
+    game.add_player('Dow', 3, True, [0, 12, 19])
+    for name, ncards in [('Tave', 4), ('Osanna', 3), ('Lucinda', 4),
+                         ('Nathan', 4)]:
+        game.add_player(name, ncards)
+    return game
+
+SUGGESTIONS = [
+    ('Tave', [1, 7, 13], [('Osanna', None), ('Lucinda', True)]),
+    ('Osanna', [2, 8, 14], [('Lucinda', None), ('Nathan', True)]),
+    ('Dow', [3, 9, 15], [('Tave', 9)]),
+    ('Lucinda', [4, 10, 16], [('Nathan', None), ('Dow', None),
+                              ('Tave', True)]),
+    ('Nathan', [5, 11, 17], [('Dow', None), ('Tave', None),
+                             ('Osanna', True)]),
+]
+
+def hands(game):
+    return [(p.name, sorted(p.pos), sorted(p.neg), sorted(p.hand.branches))
+            for p in game.players]
+
+def test_load_replays_tail(tmp_path):
+    path = str(tmp_path / 'game')
+    log = EventLog(path, snapshot_every=2)
+    game = Game()
+    log.start(game)
+    game.add_player('Dow', 3, True, [0, 12, 19])
+    for name, ncards in [('Tave', 4), ('Osanna', 3), ('Lucinda', 4),
+                         ('Nathan', 4)]:
+        game.add_player(name, ncards)
+    for s in SUGGESTIONS:
+        game.suggest(*s)
+
+    with open(path + '.snap') as f:
+        assert json.load(f)['events'] == 10
+    loaded = EventLog(path).load()
+    assert hands(loaded) == hands(game)
+    assert hands(EventLog(path).replay()) == hands(game)
+
+def test_save_midgame_and_crash(tmp_path):
+    path = str(tmp_path / 'game')
+    game = new_game()
+    game.suggest(*SUGGESTIONS[0])
+    EventLog(path).start(game)
+    for s in SUGGESTIONS[1:]:
+        game.suggest(*s)
+    # a line cut short by a crash is dropped
+    with open(path + '.log', 'a') as f:
+        f.write('{"type": "sugg')
+
+    loaded = EventLog(path).load()
+    assert hands(loaded) == hands(game)
+    loaded.remove_player('Nathan')
+    again = EventLog(path).load()
+    assert [p.name for p in again.players] == ['Dow', 'Tave', 'Osanna',
+                                               'Lucinda']
+
+def test_undo_is_saved(tmp_path):
+    path = str(tmp_path / 'game')
+    game = new_game(EventLog(path))
+    game.suggest(*SUGGESTIONS[0])
+    game.suggest(*SUGGESTIONS[1])
+    game.undo()
+    game.suggest(*SUGGESTIONS[2])
+    assert hands(EventLog(path).load()) == hands(game)
+    assert hands(EventLog(path).replay()) == hands(game)
+    game.undo()
+    game.undo()
+    game.redo()
+    assert hands(EventLog(path).load()) == hands(game)
+    assert hands(EventLog(path).replay()) == hands(game)
+    loaded = EventLog(path).load()
+    loaded.suggest(*SUGGESTIONS[3])
+    assert loaded.undo()
+    assert hands(EventLog(path).replay()) == hands(game)
+
+def test_in_effect():
+    events = [{'type': 'delete', 'name': n} for n in 'abcd']
+    assert in_effect(events[:3] + [{'type': 'goto', 'version': 1},
+                                   events[3]]) == [events[0], events[3]]
+    assert in_effect(events[:3] + [{'type': 'goto', 'version': 1},
+                                   {'type': 'goto', 'version': 2}]) == \
+           events[:2]
+
+def test_ingest():
+    game = new_game()
+    for s in SUGGESTIONS:
+        game.suggest(*s)
+    batch = new_game()
+    batch.ingest([event for event, state in game.history[6:]])
+    assert [(p.name, p.pos, p.neg) for p in batch.players] == \
+           [(p.name, p.pos, p.neg) for p in game.players]
+    assert batch.history == [(None, batch.state())]
+
+def test_load_observers(tmp_path):
+    path = str(tmp_path / 'game')
+    game = Game(observe=True)
+    EventLog(path, snapshot_every=3).start(game)
+    game.add_player('Dow', 3, True, [0, 12, 19])
+    for name, ncards in [('Tave', 4), ('Osanna', 3), ('Lucinda', 4),
+                         ('Nathan', 4)]:
+        game.add_player(name, ncards)
+    game.suggest('Tave', [0, 6, 14], [('Osanna', None), ('Lucinda', None),
+                                      ('Nathan', None), ('Dow', True)],
+                 shown=0)
+    for s in SUGGESTIONS:
+        game.suggest(*s)
+
+    loaded = EventLog(path).load(observe=True)
+    for p in game.players[1:]:
+        assert loaded.progress(p.name) == game.progress(p.name)
+    assert loaded.progress('Tave')['cpu_cards'] == [0]
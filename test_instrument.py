@@ -0,0 +1,59 @@
+import io
+import json
+from random import Random
+import instrument
+from engine import *
+
+def test_counters():
+    instrument.reset()
+    instrument.enable()
+    try:
+        players = [Player('P{}'.format(i+1), 6, False) for i in range(3)]
+        play(players, rng=Random(1))
+        hand = Player('Hand', 3, False)
+        hand.update_for_yes([0, 6, 12])
+        # 9 copies, {0, 12} twice, and {0} and {12} absorb all but {6, 7}
+        hand.update_for_yes([0, 7, 12])
+        # {12} is pruned
+        hand.update_for_no([12])
+        # {6, 7} absorbs {6, 7, 1} and {6, 7, 13}
+        hand.update_for_yes([1, 6, 13])
+    finally:
+        instrument.disable()
+    counts = instrument.report()
+    add = counts['trees']['Hand']['add_pos']
+    assert (add['calls'], add['branches_before'], add['branches_after'],
+            add['max_branches']) == (3, 5, 10, 4)
+    assert (add['pruned'], add['deduplicated'], add['absorbed']) == (0, 1, 7)
+    neg = counts['trees']['Hand']['add_neg']
+    assert (neg['calls'], neg['branches_before'], neg['branches_after']) == \
+           (1, 3, 2)
+    assert (neg['pruned'], neg['deduplicated'], neg['absorbed']) == (1, 0, 0)
+    assert counts['trees']['P1']['add_pos']['calls'] > 0
+    assert counts['calls']['found_solution']['calls'] > 0
+    assert counts['calls']['Player.update_for_no[P1]']['calls'] > 0
+    out = io.StringIO()
+    instrument.dump(out)
+    assert json.loads(out.getvalue()) == counts
+
+def test_disabled():
+    instrument.reset()
+    t = bittree()
+    t.add_pos([1, 2])
+    t.add_neg([1])
+    assert t.branches == [(4, 2)]
+    assert getattr(t, 'last_update', None) is None
+    assert instrument.report() == {'trees': {}, 'calls': {}}
+
+def test_update_counts():
+    instrument.reset()
+    t = bittree()
+    t.label = 'counted'
+    instrument.enable()
+    try:
+        t.add_pos([1, 2])
+        t.add_neg([1])
+    finally:
+        instrument.disable()
+    assert t.last_update == (2, 1, 0)
+    assert instrument.report()['trees']['counted']['add_neg']['pruned'] == 1
@@ -0,0 +1,56 @@
+import random
+import pytest
+np = pytest.importorskip('numpy')
+from logic_tree import bittree
+from nptree import nptree
+
+def same(t1, t2):
+    assert sorted(t1.branches) == sorted(t2.branches)
+    assert t1.possibles() == t2.possibles()
+    assert t1.common_elements() == t2.common_elements()
+    assert t1.simple() == t2.simple()
+
+def test_simple():
+    t = nptree()
+    t.add_pos([1, 2, 3])
+    t.add_neg([2, 3])
+    assert t.simple() == [(1, True), (2, False), (3, False)]
+    t.add_pos([4, 5])
+    assert t.possibles() == [[4], [5]]
+    assert t.pos_elements() == {1}
+
+def test_wide_cards():
+    t = nptree()
+    t.add_pos([3, 70, 130])
+    t.add_neg([3])
+    assert t.possibles() == [[70], [130]]
+    assert t.neg_elements() == {3}
+
+def test_random_queries():
+    rng = random.Random(5)
+    for _ in range(20):
+        t1, t2 = bittree(), nptree()
+        for _ in range(8):
+            query = rng.sample(range(90), 3)
+            if rng.random() < 0.4:
+                t1.add_neg(query)
+                t2.add_neg(query)
+            else:
+                t1.add_pos(query)
+                t2.add_pos(query)
+            same(t1, t2)
+
+def test_players(tmp_path):
+    from engine import Player, play
+    from eventlog import EventLog, player_state, restore_player
+    from deck import CLASSIC
+    results = []
+    for tree in (bittree, nptree):
+        players = [Player(name, n, False, tree=tree) for name, n in
+                   [('Dow', 3), ('Tave', 4), ('Osanna', 3), ('Lucinda', 4),
+                    ('Nathan', 4)]]
+        results.append(play(players, rng=random.Random(11))[1:])
+        loaded = restore_player(player_state(players[1]), CLASSIC)
+        assert isinstance(loaded.hand, tree)
+        assert loaded.hand.branches == players[1].hand.branches
+    assert results[0] == results[1]
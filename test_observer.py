@@ -0,0 +1,84 @@
+from random import Random
+from engine import *
+from observer import BranchStore, storedtree
+
+def game_with_suggestions():
+    game = Game(observe=True)
+    game.add_player('Dow', 3, True, [0, 12, 19])
+    for name, ncards in [('Tave', 4), ('Osanna', 3), ('Lucinda', 4),
+                         ('Nathan', 4)]:
+        game.add_player(name, ncards)
+    # Tave sees which of Dow's cards is shown; the others don't
+    game.suggest('Tave', [0, 6, 14], [('Osanna', None), ('Lucinda', None),
+                                      ('Nathan', None), ('Dow', True)],
+                 shown=0)
+    game.suggest('Dow', [4, 10, 18], [('Tave', None), ('Osanna', 10)])
+    return game
+
+def test_views():
+    game = game_with_suggestions()
+    assert set(game.observers.views) == {'Tave', 'Osanna', 'Lucinda',
+                                         'Nathan'}
+    assert game.progress('Tave')['cpu_cards'] == [0]
+    assert game.progress('Osanna')['cpu_cards'] == []
+    tave = {p.name: p for p in game.observers.view('Tave')}
+    nathan = {p.name: p for p in game.observers.view('Nathan')}
+    assert 0 in tave['Dow'].pos and 0 not in nathan['Dow'].pos
+    # only Dow saw Osanna's card
+    assert 10 not in nathan['Osanna'].pos
+    assert {4, 10, 18} <= nathan['Tave'].neg
+    # the views that saw the same things share their branches
+    assert nathan['Osanna'].hand.branches is \
+           {p.name: p for p in game.observers.view('Lucinda')}['Osanna'] \
+           .hand.branches
+
+def test_undo():
+    game = game_with_suggestions()
+    assert game.undo() and game.undo()
+    assert game.progress('Tave')['cpu_cards'] == []
+    assert game.redo()
+    assert game.progress('Tave')['cpu_cards'] == [0]
+    assert len(game.players) == 5
+
+def test_store():
+    store = BranchStore()
+    a, b = storedtree(store), storedtree(store)
+    for t in (a, b):
+        t.add_pos([1, 2, 3])
+        t.add_neg([2])
+    assert a.branches is b.branches
+    assert a.simple() == b.simple()
+
+def test_advise():
+    game = game_with_suggestions()
+    # Tave has seen 0 already, so showing it again tells Tave nothing
+    card, leaks = game.observers.advise('Tave', [0, 12])
+    assert card == 0 and leaks[0] == 0 < leaks[12]
+    assert game.advise('Tave', [0, 7, 12]) == 0
+    assert game.advise('Osanna', [1, 7, 13]) is None
+    # the views are left as they were
+    assert game.progress('Tave')['cpu_cards'] == [0]
+
+def test_ingest():
+    game = game_with_suggestions()
+    batch = Game(observe=True)
+    batch.ingest([event for event, state in game.history[1:]])
+    assert batch.progress('Tave') == game.progress('Tave')
+    assert [(p.name, p.pos, p.neg) for p in batch.observers.view('Nathan')] \
+           == [(p.name, p.pos, p.neg) for p in game.observers.view('Nathan')]
+
+def test_store_is_collected():
+    game = game_with_suggestions()
+    rng = Random(2)
+    sizes = []
+    for _ in range(200):
+        with game.speculate():
+            query = indices_to_all(CLASSIC.random_suggestion(rng))
+            game.suggest('Osanna', query, [('Lucinda', True)])
+        sizes.append(len(game.observers.store))
+    assert max(sizes) < 40
+    store = game.observers.store
+    store.collect(p.hand for view in game.observers.views.values()
+                  for p in view)
+    assert len(store) <= 1 + 5 * 4
+    assert game.progress('Tave')['cpu_cards'] == [0]
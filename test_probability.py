@@ -0,0 +1,74 @@
+from itertools import permutations
+from logic_tree import bittree, cnftree
+from probability import DealCounter
+from fixtures import CATEGORIES, players_with
+
+def brute_force(players):
+    """ the number of consistent deals, and of those with each
+        (owner, card) """
+    counts = [[0] * 8 for _ in range(len(players)+1)]
+    total = 0
+    labels = [o for o, p in enumerate(players) for _ in range(p.ncards)] \
+             + [len(players)] * len(CATEGORIES)
+    for deal in set(permutations(labels)):
+        if any(sum(deal[c] == len(players) for c in cat) != 1
+               for cat in CATEGORIES):
+            continue
+        hands = [{c for c, o1 in enumerate(deal) if o1 == o}
+                 for o in range(len(players))]
+        if all(not p.hand.branches or any(
+                   hand >= {a.num for a in b if a.bval} and
+                   not hand & {a.num for a in b if not a.bval}
+                   for b in map(p.hand.expand().atoms
+                                if hasattr(p.hand, 'expand')
+                                else p.hand.atoms, p.hand.branches))
+               for hand, p in zip(hands, players)):
+            total += 1
+            for c, o in enumerate(deal):
+                counts[o][c] += 1
+    return total, counts
+
+UPDATES = [(0, True, (0, 3, 5)), (1, False, (0, 3)), (2, True, (1, 4, 6)),
+           (0, True, (1, 4, 7)), (1, True, (2, 4, 7))]
+
+def test_counts_match_brute_force():
+    for tree in (bittree, cnftree):
+        players = players_with(*UPDATES, tree=tree)
+        counter = DealCounter(players, CATEGORIES)
+        total, counts = brute_force(players)
+
+        assert total > 0
+        assert counter.total == total
+        assert counter.counts == counts
+
+def test_probabilities():
+    players = players_with((2, True, (0,)), (0, False, (1, 2, 3, 5, 6)))
+    probs = DealCounter(players, CATEGORIES).solution_probabilities()
+
+    assert probs[3] == 1.0
+    assert probs[1] == probs[2] == 0.5
+    assert probs[0] == probs[4] == probs[7] == 0.0
+    assert probs[5] == probs[6] == 0.5
+
+def test_inconsistent():
+    players = players_with((2, True, (0,)), (2, True, (1,)))
+
+    assert DealCounter(players, CATEGORIES).total == 0
+
+def test_deadline():
+    players = players_with(*UPDATES)
+    counter = DealCounter(players, CATEGORIES, deadline=0)
+    assert not counter.complete and counter.total == 0
+    assert counter.solution_probabilities() == [0.0] * 8
+    assert DealCounter(players, CATEGORIES).complete
+
+def test_contradictory_tree():
+    updates = [(2, True, (2, 3, 5)), (2, False, (2, 3, 5)),
+               (1, True, (2, 4, 5)), (2, True, (0, 3, 7))]
+    for tree in (bittree, cnftree):
+        players = players_with(*updates, tree=tree)
+        counter = DealCounter(players, CATEGORIES)
+        total, counts = brute_force(players)
+
+        assert counter.total == total
+        assert counter.counts == counts
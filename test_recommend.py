@@ -0,0 +1,52 @@
+import math
+from collections import Counter
+import pytest
+np = pytest.importorskip('numpy')
+from recommend import information_gain
+
+CATEGORIES = [range(0, 2), range(2, 4), range(4, 6)]
+
+def brute_gain(deals, order, query, sees_card):
+    """ information gain of one query, computed deal by deal """
+    outcomes = Counter()
+    choice = 0.0
+    for deal in deals:
+        for rank, o in enumerate(order):
+            held = [c for c in query if deal[c] == o]
+            if held:
+                for c in held:
+                    outcomes[(rank, c if sees_card else None)] += 1 / len(held)
+                if sees_card:
+                    choice += math.log2(len(held))
+                break
+        else:
+            outcomes[None] += 1
+    n = len(deals)
+    return -sum(k/n * math.log2(k/n) for k in outcomes.values()) - choice/n
+
+def test_information_gain_matches_brute_force():
+    # owners 0 (the suggester), 1 and 2 hold two cards each,
+    # owner 3 is the envelope
+    deals = [[0, 3, 1, 2, 3, 1, ], [3, 1, 2, 3, 1, 3],
+             [1, 3, 3, 2, 2, 3], [3, 2, 1, 3, 3, 0]]
+    owners = np.array(deals, dtype=np.int8)
+    for sees_card in (True, False):
+        gain = information_gain(owners, 4, CATEGORIES, [1, 2], sees_card)
+        for s in range(2):
+            for w in range(2):
+                for r in range(2):
+                    query = (s, 2 + w, 4 + r)
+                    expected = brute_gain(deals, [1, 2], query, sees_card)
+                    assert abs(gain[s, w, r] - expected) < 1e-9
+
+def test_information_gain_four_categories():
+    categories = [range(0, 2), range(2, 4), range(4, 5), range(5, 7)]
+    rng = np.random.default_rng(3)
+    deals = rng.integers(0, 4, size=(20, 7)).tolist()
+    owners = np.array(deals, dtype=np.int8)
+    gain = information_gain(owners, 4, categories, [2, 1])
+    assert gain.shape == (2, 2, 1, 2)
+    for index in np.ndindex(gain.shape):
+        query = [cat[i] for cat, i in zip(categories, index)]
+        expected = brute_gain(deals, [2, 1], query, True)
+        assert abs(gain[index] - expected) < 1e-9
@@ -0,0 +1,41 @@
+from logic_tree import bittree
+from probability import DealCounter
+from sampler import estimate, sample_deals
+from solver import Solver
+from fixtures import CATEGORIES, owner, players_with
+
+UPDATES = [(0, True, (0, 3, 5)), (1, False, (0, 3)), (2, True, (1, 4, 6)),
+           (0, True, (1, 4, 7))]
+
+def test_sampled_deals_are_consistent():
+    players = players_with(*UPDATES)
+    exact = Solver(players, CATEGORIES)
+    deals = list(sample_deals(Solver(players, CATEGORIES), 200, seed=1))
+
+    assert len(deals) == 200
+    for deal in deals:
+        exact.nodes = exact.limit
+        assert exact.search(deal)
+        assert sum(bin(hand).count('1') for hand in deal) == 8
+
+def test_estimate_close_to_exact():
+    categories = [range(0, 4), range(4, 8), range(8, 12)]
+    players = [owner(3, bittree()) for _ in range(3)]
+    players[0].hand.add_pos((0, 4, 8))
+    players[1].hand.add_neg((0, 4, 8))
+    players[1].hand.add_pos((1, 5, 9))
+    players[2].hand.add_pos((1, 6, 10))
+    players[2].hand.add_pos((2, 5, 11))
+    exact = DealCounter(players, categories).solution_probabilities()
+    result = estimate(players, categories, samples=4000, workers=2)
+
+    assert result.complete and result.samples == 4000
+    for p, (q, low, high) in zip(exact, result.solution_probabilities()):
+        assert low <= q <= high and high - low < 0.1
+        assert abs(p - q) < 0.03
+
+def test_estimate_inconsistent():
+    players = players_with((2, True, (0,)), (2, True, (1,)))
+    result = estimate(players, CATEGORIES, samples=10, workers=1)
+
+    assert result.samples == 0
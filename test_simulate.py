@@ -0,0 +1,21 @@
+import json
+from simulate import run_game, simulate, summarize
+
+def test_run_game():
+    result = run_game(3)
+
+    assert result['solved']
+    assert result == dict(run_game(3), seconds=result['seconds'])
+    assert len(result['peak_branches']) == 5
+
+def test_simulate_resumes(tmp_path):
+    path = str(tmp_path / 'results.jsonl')
+    simulate(path, 2, workers=1)
+    simulate(path, 3, workers=1)
+    with open(path) as f:
+        seeds = sorted(json.loads(line)['seed'] for line in f)
+
+    assert seeds == [0, 1, 2]
+    summary = summarize(path)
+    assert summary['games'] == 3
+    assert summary['solve_rate'] == 1.0
@@ -0,0 +1,59 @@
+from itertools import permutations
+from solver import Solver
+from fixtures import CATEGORIES, players_with
+
+def brute_force(players):
+    """ the possible owners of each card over every consistent deal """
+    possible = [set() for _ in range(len(players)+1)]
+    labels = [o for o, p in enumerate(players) for _ in range(p.ncards)] \
+             + [len(players)] * len(CATEGORIES)
+    for deal in set(permutations(labels)):
+        if any(sum(deal[c] == len(players) for c in cat) != 1
+               for cat in CATEGORIES):
+            continue
+        ok = True
+        for o, p in enumerate(players):
+            hand = {c for c, o1 in enumerate(deal) if o1 == o}
+            if p.hand.branches and not any(
+                    hand >= {a.num for a in b if a.bval} and
+                    not hand & {a.num for a in b if not a.bval}
+                    for b in map(p.hand.atoms, p.hand.branches)):
+                ok = False
+        if ok:
+            for c, o in enumerate(deal):
+                possible[o].add(c)
+    return possible
+
+def test_solver_matches_brute_force():
+    players = players_with((0, True, (0, 3, 5)), (1, False, (0, 3, 5)),
+                           (2, True, (1, 4, 6)), (0, False, (4, 7)))
+    solver = Solver(players, CATEGORIES)
+    expected = brute_force(players)
+
+    assert solver.consistent()
+    for o in range(len(players)+1):
+        assert solver.possible(o) == expected[o]
+
+def test_solver_uses_ncards():
+    players = players_with((2, True, (0,)), (0, False, (1, 2, 3, 5, 6)))
+    solver = Solver(players, CATEGORIES)
+
+    assert solver.known(0) == {4, 7}
+    assert solver.solution_nums() == {3}
+
+def test_solver_inconsistent():
+    players = players_with((2, True, (0,)), (2, True, (1,)))
+
+    assert not Solver(players, CATEGORIES).consistent()
+
+def test_solver_past_deadline():
+    players = players_with((0, True, (0, 3, 5)), (1, False, (0, 3, 5)),
+                           (2, True, (1, 4, 6)), (0, False, (4, 7)))
+    solver = Solver(players, CATEGORIES, deadline=0)
+    expected = brute_force(players)
+
+    assert solver.consistent()
+    for o in range(len(players)+1):
+        assert solver.possible(o) >= expected[o]
+    assert any(solver.possible(o) != expected[o]
+               for o in range(len(players)+1))
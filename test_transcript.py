@@ -0,0 +1,53 @@
+import io
+import json
+from transcript import solve
+
+LINES = [
+    {"type": "player", "name": "Dow", "ncards": 3, "is_cpu": True,
+     "knowns": ["Colonel Mustard", "knife", "library"]},
+    {"type": "player", "name": "Tave", "ncards": 4},
+    {"type": "player", "name": "Osanna", "ncards": 3},
+    {"type": "player", "name": "Lucinda", "ncards": 4},
+    {"type": "player", "name": "Nathan", "ncards": 4},
+    {"type": "suggestion", "suggester": "Dow",
+     "query": ["Mr. Green", "rope", "hall"],
+     "responses": [["Tave", None], ["Osanna", None], ["Lucinda", None],
+                   ["Nathan", None]]},
+]
+
+def run(lines):
+    out = io.StringIO()
+    solve([line if isinstance(line, str) else json.dumps(line)
+           for line in lines], out)
+    return [json.loads(line) for line in out.getvalue().splitlines()]
+
+def test_stream():
+    found = run(LINES + ['{"type": "sugg', {'type': 'delete'}])
+    assert {'event': 1, 'type': 'known', 'player': 'Dow',
+            'card': 'knife', 'has': True} in found
+    solution = [d for d in found if d['type'] == 'solution']
+    assert solution[-1] == {'event': 6, 'type': 'solution',
+                            'cards': ['Mr. Green', 'rope', 'hall'],
+                            'complete': True}
+    assert [(d['type'], d['event']) for d in found[-2:]] == \
+           [('error', 7), ('error', 8)]
+
+def test_new_game():
+    found = run(LINES[:2] + [{"type": "game", "deck": "master"},
+                             {"type": "player", "name": "Dow", "ncards": 9,
+                              "is_cpu": True, "knowns": list(range(9))}])
+    assert found[-1]['event'] == 4
+    assert {'event': 4, 'type': 'known', 'player': 'Dow',
+            'card': 'Sergeant Gray', 'has': True} in found
+
+def test_bad_cards():
+    found = run(LINES[:5] + [
+        {"type": "suggestion", "suggester": "Dow", "query": [1, 7, 99],
+         "responses": [["Tave", None]]},
+        {"type": "suggestion", "suggester": "Dow", "query": [1, 2, 12],
+         "responses": [["Tave", None]]},
+        LINES[5]])
+    assert [d['event'] for d in found if d['type'] == 'error'] == [6, 7]
+    assert found[-1]['event'] == 8
+    assert {'event': 8, 'type': 'known', 'player': 'Tave',
+            'card': 'Mr. Green', 'has': False} in found
@@ -28,6 +28,133 @@ def test_more_complicated():
     assert atom(4, True) in common
     assert atom(5, False) in common
     assert atom(6, False) in common
-    assert [2, 8] in possibles
-    assert [3, 8] in possibles
-    assert [2, 3] in possibles
+    assert possibles == [[2], [3]]
+
+def test_bittree_add_both():
+    t = bittree()
+    t.add_pos((1,2,3))
+    t.add_pos((4,5,6))
+    t.add_neg((1,5,6))
+    common = t.common_elements()
+
+    assert common == {atom(1, False), atom(4, True),
+                      atom(5, False), atom(6, False)}
+    assert t.pos_elements() == {4}
+    assert t.neg_elements() == {1, 5, 6}
+    assert t.contains_any((3, 4)) == {4}
+
+def test_bittree_matches_tree():
+    queries = [(True, (1,2,3)), (True, (4,5,6)), (False, (1,5,6)),
+               (True, (2,8,4)), (False, (7,9,10)), (True, (3,9,11))]
+    t, bt = tree(), bittree()
+    for pos, query in queries:
+        if pos:
+            t.add_pos(query)
+            bt.add_pos(query)
+        else:
+            t.add_neg(query)
+            bt.add_neg(query)
+        assert bt.simple() == t.simple()
+
+def test_absorb():
+    for t in (tree(), bittree()):
+        t.add_pos((1,2,3))
+        t.add_pos((1,4))
+        t.add_pos((1,5))
+
+        assert t.possibles() == [[1], [2, 4, 5], [3, 4, 5]]
+
+def test_no_duplicate_branches():
+    # the same branches are reached by adding the cards in other orders
+    for t in (tree(), bittree()):
+        t.add_pos((1,2,3))
+        t.add_pos((3,2,1))
+        t.add_pos((2,3,1))
+
+        assert len(t.branches) == len(set(t.branches)) == 3
+        assert t.possibles() == [[1], [2], [3]]
+
+def test_cnftree_matches_bittree():
+    queries = [(True, (1,2,3)), (True, (4,5,6)), (False, (1,5,6)),
+               (True, (2,8,4)), (False, (7,9,10)), (True, (3,9,11)),
+               (True, (12,13,14)), (False, (2,12))]
+    t, bt = cnftree(), bittree()
+    for pos, query in queries:
+        if pos:
+            t.add_pos(query)
+            bt.add_pos(query)
+        else:
+            t.add_neg(query)
+            bt.add_neg(query)
+        assert t.simple() == bt.simple()
+        assert t.pos_elements() == bt.pos_elements()
+        assert t.neg_elements() == bt.neg_elements()
+
+def test_cnftree_is_lazy():
+    t = cnftree()
+    t.add_pos((1,2,3))
+    t.add_pos((4,5,6))
+    t.add_neg((1,5))
+
+    assert sorted(t.clauses) == [bits((2,3)), bits((4,6))]
+    assert t.expanded is None
+    assert len(t.branches) == 4
+    t.add_neg((4,))
+
+    assert t.pos_elements() == {6}
+    assert t.expanded is None
+
+def test_budgettree():
+    t, bt = budgettree(budget=30), bittree()
+    for i in range(4):
+        t.add_pos((3*i, 3*i+1, 3*i+2))
+        bt.add_pos((3*i, 3*i+1, 3*i+2))
+    assert t.degraded
+    assert len(t.branches) == 27
+    # every branch of the exact tree is within one of the coarse branches
+    assert all(any(p & pos == p for p, n in t.branches)
+               for pos, neg in bt.branches)
+
+    t.add_neg((0, 1, 3, 4))
+    bt.add_neg((0, 1, 3, 4))
+    assert not t.degraded
+    assert t.simple() == bt.simple()
+    assert t.pos_elements() == bt.pos_elements() == {2, 5}
+
+def test_add_queries():
+    queries = [(True, (1,2,3)), (True, (4,5,6)), (False, (1,5,6)),
+               (True, (2,8,4)), (False, (7,9,10)), (True, (3,9,11)),
+               (True, (12,)), (True, (12,13,14)), (False, (2,))]
+    for cls in (tree, bittree, cnftree):
+        t, batch = cls(), cls()
+        for pos, query in queries:
+            if pos:
+                t.add_pos(query)
+            else:
+                t.add_neg(query)
+        batch.add_queries(queries)
+        assert batch.simple() == t.simple()
+
+    assert order_queries(queries) == [
+        (False, [1, 2, 5, 6, 7, 9, 10]), (True, [3]), (True, [4]),
+        (True, [12])]
+
+def test_add_queries_contradiction():
+    t = bittree()
+    t.add_queries([(True, (12,)), (True, (4,5)), (False, (12,))])
+    assert t.branches == []
+
+def test_speculate():
+    for cls in (tree, bittree, cnftree, budgettree):
+        t = cls()
+        t.add_pos((1,2,3))
+        t.add_neg((4,))
+        before = t.simple()
+        with t.speculate():
+            t.add_neg((1,2))
+            assert t.pos_elements() == {3}
+        assert t.simple() == before
+        with speculation(t):
+            t.add_pos((4,))
+            assert t.branches == []
+        assert t.simple() == before
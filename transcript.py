@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+""" Solve games from a stream of JSONL events, writing deductions as JSONL.
+
+    Each input line is one event, as in the event log (see eventlog):
+        {"type": "player", "name": ..., "ncards": ..., "is_cpu": ...,
+         "knowns": [...]}
+        {"type": "suggestion", "suggester": ..., "query": [...],
+         "responses": [[name, response], ...]}
+        {"type": "delete", "name": ...}
+    and a game is started afresh, optionally with another deck, by
+        {"type": "game", "deck": "classic" | "master" | {"names": ...,
+         "categories": ...}}
+    Cards may be given as indices into the deck or by name.  A response
+    is null if the player had none of the cards, true if a card was shown
+    but not seen, or the card that was shown.
+
+    After each event, anything newly derived is written straight away:
+        {"event": n, "type": "known", "player": ..., "card": ..., "has": ...}
+        {"event": n, "type": "solution", "cards": [...], "complete": ...}
+        {"event": n, "type": "likely", "cards": [[card, count], ...]}
+    and a line that cannot be used gives
+        {"event": n, "type": "error", "message": ...}
+    No history is kept, so memory stays the same however long the game.
+"""
+import argparse
+import json
+import sys
+from deck import Deck, CLASSIC, MASTER_DETECTIVE
+from engine import Game, definite_solution_nums, likely_solution
+
+DECKS = {'classic': CLASSIC, 'master': MASTER_DETECTIVE}
+
+class Transcript:
+    """ A game fed one event at a time, which reports what it learns.
+        Events are numbered from 1 through the whole stream.
+    """
+
+    def __init__(self, deck=CLASSIC):
+        self.events = 0
+        self.start(deck)
+
+    def start(self, deck):
+        self.game = Game(deck=deck, history=False)
+        self.known = {}
+        self.solution = set()
+        self.likely = []
+
+    def card(self, card):
+        """ a card given by index or name, as an index """
+        if isinstance(card, str):
+            return self.game.deck.cards.index(card)
+        if isinstance(card, bool) or card not in range(len(self.game.deck)):
+            raise ValueError('no card {!r} in the deck'.format(card))
+        return card
+
+    def query(self, query):
+        """ the cards of a suggestion, one from each category """
+        query = [self.card(c) for c in query]
+        if any(sum(c in cat for c in query) != 1
+               for cat in self.game.deck.categories):
+            raise ValueError('a suggestion names one card of each category')
+        return query
+
+    def event(self, event):
+        """ Convert the cards in an event to indices; a new dict """
+        event = dict(event)
+        if event['type'] == 'player' and event.get('knowns') is not None:
+            event['knowns'] = [self.card(c) for c in event['knowns']]
+        elif event['type'] == 'suggestion':
+            event['query'] = self.query(event['query'])
+            event['responses'] = [
+                [name, r if r is None or r is True else self.card(r)]
+                for name, r in event['responses']]
+        return event
+
+    def feed(self, event):
+        """ Apply one event and return the list of new deductions """
+        self.events += 1
+        if event['type'] == 'game':
+            deck = event.get('deck', 'classic')
+            self.start(DECKS[deck] if isinstance(deck, str)
+                       else Deck.from_json(deck))
+            return []
+        event = self.event(event)
+        event.setdefault('is_cpu', False)
+        event.setdefault('knowns', None)
+        self.game.record(event)
+        return self.deductions()
+
+    def deductions(self):
+        """ what has been learned since the last call """
+        found = []
+        cards = self.game.deck.cards
+        for p in self.game.players:
+            seen = self.known.setdefault(p.name, (set(), set()))
+            for has, now, before in ((True, p.pos, seen[0]),
+                                     (False, p.neg, seen[1])):
+                for n in sorted(now - before):
+                    found.append({'type': 'known', 'player': p.name,
+                                  'card': cards[n], 'has': has})
+                before |= now
+        solution = definite_solution_nums(self.game.players)
+        if solution != self.solution:
+            self.solution = solution
+            found.append({'type': 'solution',
+                          'cards': [cards[n] for n in sorted(solution)],
+                          'complete': len(solution) ==
+                                      len(self.game.deck.categories)})
+        likely = [list(c) for c in likely_solution(self.game.players)]
+        if likely != self.likely:
+            self.likely = likely
+            found.append({'type': 'likely', 'cards': likely})
+        return [dict(event=self.events, **d) for d in found]
+
+    def error(self, e):
+        return [{'event': self.events, 'type': 'error',
+                 'message': '{}: {}'.format(type(e).__name__, e)}]
+
+    def feed_line(self, line):
+        """ feed one line of JSON, reporting any error as a deduction """
+        try:
+            event = json.loads(line)
+        except ValueError as e:
+            self.events += 1
+            return self.error(e)
+        try:
+            return self.feed(event)
+        except (ValueError, KeyError, TypeError, StopIteration) as e:
+            return self.error(e)
+
+def solve(lines, out, deck=CLASSIC):
+    """ feed JSONL lines to a transcript, writing deductions as they come """
+    transcript = Transcript(deck)
+    for line in lines:
+        if not line.strip():
+            continue
+        for d in transcript.feed_line(line):
+            out.write(json.dumps(d) + '\n')
+        out.flush()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('input', nargs='?', default='-',
+                        help='JSONL events (default: stdin)')
+    parser.add_argument('-d', '--deck', default='classic',
+                        choices=sorted(DECKS), help='deck to start with')
+    args = parser.parse_args(argv)
+    if args.input == '-':
+        solve(sys.stdin, sys.stdout, DECKS[args.deck])
+    else:
+        with open(args.input) as f:
+            solve(f, sys.stdout, DECKS[args.deck])
+
+if __name__ == '__main__':
+    main()